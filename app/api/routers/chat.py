@@ -1,15 +1,45 @@
 import asyncio
+import itertools
+import json
 import logging
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException, Request
-from llama_index.core.postprocessor import MetadataReplacementPostProcessor
+from fastapi.responses import StreamingResponse
+from llama_index.core import QueryBundle, Settings
 from llama_index.core.prompts import PromptTemplate
 from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import MetadataMode, NodeWithScore
 from pydantic import BaseModel
 
-from app.api.routers.stream_response import VercelStreamResponse
+from app.api.routers.stream_response import VercelStreamResponse, flush_policy
 from app.config import config
-from app.utils.index import create_meeting_index, get_global_index, get_patient_index
+from app.utils.answer_cache import CachedResponse, answer_cache
+from app.utils.context import ContextPacker
+from app.utils.embedding import embed_queries
+from app.utils.index import (
+    GLOBAL_COLLECTION_NAME,
+    data_version,
+    ensure_embed_model,
+    ensure_llm,
+    get_global_index,
+    get_global_indexes,
+    get_meeting_index,
+    get_patient_index,
+    global_data_version,
+    meeting_filters,
+)
+from app.utils.index_client import index_client
+from app.utils.llm import TokenStream, acomplete
+from app.utils.llm_governor import (
+    BATCH,
+    INTERACTIVE,
+    LLMDeadlineExceeded,
+    llm_governor,
+)
+from app.utils.metrics import ANSWER_CACHE, RequestTimer
+from app.utils.registry import index_registry
+from app.utils.retrieval import FederatedRetriever, RemoteRetriever
 
 chat_docs = APIRouter()
 
@@ -32,32 +62,239 @@ class MeetingQuestionRequest(BaseModel):
     prompt: str
 
 
-def get_query_engine(index):
-    retriever = index.as_retriever(similarity_top_k=10)
+class BatchQuestionRequest(BaseModel):
+    patient_names: List[str]
+    prompts: List[str]
+
+
+SIMILARITY_TOP_K = 10
+QA_PROMPT = PromptTemplate(config.SYSTEM_PROMPT)
+
+
+def build_query_engine(index, filters=None):
+    return build_retriever_query_engine(
+        index.as_retriever(similarity_top_k=SIMILARITY_TOP_K, filters=filters)
+    )
+
+
+NODE_POSTPROCESSORS = [
+    ContextPacker(
+        token_budget=config.CONTEXT_TOKEN_BUDGET,
+        similarity_threshold=config.CONTEXT_DEDUP_SIMILARITY,
+    )
+]
+
+
+def build_retriever_query_engine(retriever):
     return RetrieverQueryEngine.from_args(
         retriever,
-        text_qa_template=PromptTemplate(config.SYSTEM_PROMPT),
+        text_qa_template=QA_PROMPT,
         streaming=True,
-        node_postprocessors=[
-            MetadataReplacementPostProcessor(target_metadata_key="window")
-        ],
+        node_postprocessors=NODE_POSTPROCESSORS,
+    )
+
+
+def get_query_engine(index, collection_name: str):
+    return index_registry.get_query_engine(collection_name, index, build_query_engine)
+
+
+def get_global_query_engine():
+    if config.GLOBAL_RETRIEVAL != "federated":
+        return get_query_engine(get_global_index(), GLOBAL_COLLECTION_NAME)
+    # Built per request: the indexes themselves are cached (see
+    # get_global_indexes) and the set of patients can change between requests.
+    retriever = FederatedRetriever(
+        get_global_indexes(), similarity_top_k=SIMILARITY_TOP_K
     )
+    return build_retriever_query_engine(retriever)
+
 
+def _open_local_query_engine(kind: str, *args: str) -> Tuple[Any, str]:
+    if kind == "patient":
+        index, collection_name = get_patient_index(*args)
+        return get_query_engine(index, collection_name), collection_name
+    if kind == "meeting":
+        index, collection_name = get_meeting_index(*args)
+        query_engine = build_query_engine(index, filters=meeting_filters(args[1]))
+        return query_engine, collection_name
+    return get_global_query_engine(), GLOBAL_COLLECTION_NAME
 
-async def stream_response(request: Request, response):
+
+async def open_query_engine(kind: str, *args: str) -> Tuple[Any, str]:
+    """
+    Query engine and collection name for a ``patient``, ``meeting`` or
+    ``global`` scope. In a multi-worker deployment retrieval is done by the
+    index owner and only the engine around it lives in this process.
+    """
+    if index_client is None:
+        return await asyncio.to_thread(_open_local_query_engine, kind, *args)
+    collection_name = await asyncio.to_thread(index_client.open_collection, kind, *args)
+    # Generation stays in this process; only retrieval is remote.
+    await asyncio.to_thread(ensure_llm)
+    retriever = RemoteRetriever(
+        index_client, (kind, *args), similarity_top_k=SIMILARITY_TOP_K
+    )
+    return build_retriever_query_engine(retriever), collection_name
+
+
+def collection_version(collection_name: str) -> str:
+    if index_client is not None:
+        return index_client.data_version(collection_name)
+    if collection_name == GLOBAL_COLLECTION_NAME:
+        return global_data_version()
+    return data_version(collection_name)
+
+
+def embed_query(prompt: str) -> List[float]:
+    if index_client is not None:
+        return index_client.embed_query(prompt)
+    ensure_embed_model()
+    return Settings.embed_model.get_query_embedding(prompt)
+
+
+def embed_prompts(prompts: List[str]) -> List[List[float]]:
+    if index_client is not None:
+        return index_client.embed_queries(prompts)
+    ensure_embed_model()
+    return embed_queries(Settings.embed_model, prompts)
+
+
+async def stream_response(
+    request: Request, response, endpoint: str, on_complete=None, on_finish=None
+):
     return VercelStreamResponse(
         request=request,
         response=response,
+        on_complete=on_complete,
+        policy=flush_policy(endpoint),
+        on_finish=on_finish,
+    )
+
+
+def postprocess(
+    nodes: List[NodeWithScore], query_bundle: QueryBundle
+) -> List[NodeWithScore]:
+    for postprocessor in NODE_POSTPROCESSORS:
+        nodes = postprocessor.postprocess_nodes(nodes, query_bundle=query_bundle)
+    return nodes
+
+
+def _observe_generation(timer: RequestTimer, stream: TokenStream) -> None:
+    timer.observe_stage("ttft", stream.time_to_first_token)
+    timer.observe_stage("stream", stream.stream_seconds)
+
+
+async def retrieve_context(
+    query_engine, query_bundle: QueryBundle, timer: RequestTimer
+) -> str:
+    with timer.stage("vector_search"):
+        nodes = await asyncio.to_thread(query_engine.retriever.retrieve, query_bundle)
+    with timer.stage("postprocess"):
+        nodes = await asyncio.to_thread(postprocess, nodes, query_bundle)
+    return "\n\n".join(
+        node.node.get_content(metadata_mode=MetadataMode.LLM) for node in nodes
+    )
+
+
+async def generate_answer(
+    query_engine, query_bundle: QueryBundle, timer: RequestTimer
+) -> TokenStream:
+    """
+    Retrieve context with ``query_engine`` and start streaming the answer.
+    Retrieval runs on a worker thread and generation is started right away,
+    so tokens flow to the client as soon as the LLM produces them.
+    """
+    context_str = await retrieve_context(query_engine, query_bundle, timer)
+    # Waiting for LLM capacity happens before the response starts, so a
+    # question dropped at its deadline gets a 503 rather than a broken stream.
+    with timer.stage("llm_queue"):
+        try:
+            slot = await llm_governor.aacquire(INTERACTIVE)
+        except LLMDeadlineExceeded as e:
+            raise HTTPException(
+                status_code=503, detail=str(e), headers={"Retry-After": "5"}
+            ) from e
+    return TokenStream(
+        QA_PROMPT,
+        started_at=timer.started_at,
+        on_finish=lambda stream: _observe_generation(timer, stream),
+        slot=slot,
+        context_str=context_str,
+        query_str=query_bundle.query_str,
     )
 
 
+async def answer_query(
+    request: Request,
+    endpoint: str,
+    scope: Tuple[str, ...],
+    prompt: str,
+    cache_part: Optional[str] = None,
+):
+    """
+    Answer ``prompt`` from the collection ``scope`` names (see
+    ``open_query_engine``), timing every stage for /metrics.
+    """
+    timer = RequestTimer(endpoint)
+    try:
+        with timer.stage("open_collection"):
+            query_engine, collection_name = await open_query_engine(*scope)
+
+        embedding = None
+        on_complete = None
+        if config.ANSWER_CACHE_ENABLED:
+            # Answers restricted to part of a collection are cached under
+            # their own scope, "<collection>/<part>", which invalidating the
+            # collection drops.
+            cache_scope = (
+                f"{collection_name}/{cache_part}" if cache_part else collection_name
+            )
+            version = await asyncio.to_thread(collection_version, collection_name)
+            if answer_cache.semantic:
+                with timer.stage("embed_query"):
+                    embedding = await asyncio.to_thread(embed_query, prompt)
+            cached = answer_cache.get(cache_scope, version, prompt, embedding)
+            ANSWER_CACHE.inc(endpoint=endpoint, result="hit" if cached else "miss")
+            if cached is not None:
+                logger.info("Answer cache hit for %s", collection_name)
+                return await stream_response(
+                    request,
+                    CachedResponse(cached.tokens),
+                    endpoint,
+                    on_finish=timer.finish,
+                )
+
+            def cache_answer(tokens: List[str], embedding=embedding) -> None:
+                answer_cache.put(cache_scope, version, prompt, tokens, embedding)
+
+            on_complete = cache_answer
+
+        if embedding is None:
+            with timer.stage("embed_query"):
+                embedding = await asyncio.to_thread(embed_query, prompt)
+        response = await generate_answer(
+            query_engine, QueryBundle(query_str=prompt, embedding=embedding), timer
+        )
+        return await stream_response(
+            request,
+            response,
+            endpoint,
+            on_complete=on_complete,
+            on_finish=timer.finish,
+        )
+    except BaseException:
+        timer.finish()
+        raise
+
+
 @chat_docs.post("/ask_patient", tags=["Chat with Patient Data"])
 async def chat_with_patient(request: Request, question: QuestionRequest):
     try:
-        index, _ = get_patient_index(question.patient_name)
-        query_engine = get_query_engine(index)
-        response = await asyncio.to_thread(query_engine.query, question.prompt)
-        return await stream_response(request, response)
+        return await answer_query(
+            request, "ask_patient", ("patient", question.patient_name), question.prompt
+        )
+    except HTTPException:
+        raise
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=404, detail=str(e)
@@ -74,13 +311,13 @@ async def chat_with_all_patient_data(request: Request, question: GlobalQuestionR
         "Received global question: %s", question.prompt
     )  # Use lazy % formatting
     try:
-        index = await asyncio.to_thread(get_global_index)
-        logger.info("Global index retrieved successfully")
-        query_engine = get_query_engine(index)
-        logger.info("Query engine created")
-        response = await asyncio.to_thread(query_engine.query, question.prompt)
+        response = await answer_query(
+            request, "ask_global", ("global",), question.prompt
+        )
         logger.info("Query executed successfully")
-        return await stream_response(request, response)
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(
             "Error in chat_with_all_patient_data: %s", str(e)
@@ -93,10 +330,15 @@ async def chat_with_all_patient_data(request: Request, question: GlobalQuestionR
 @chat_docs.post("/ask_meeting", tags=["Chat with Meeting Data"])
 async def chat_with_meeting(request: Request, question: MeetingQuestionRequest):
     try:
-        index = create_meeting_index(question.patient_name, question.meeting_name)
-        query_engine = get_query_engine(index)
-        response = await asyncio.to_thread(query_engine.query, question.prompt)
-        return await stream_response(request, response)
+        return await answer_query(
+            request,
+            "ask_meeting",
+            ("meeting", question.patient_name, question.meeting_name),
+            question.prompt,
+            cache_part=question.meeting_name,
+        )
+    except HTTPException:
+        raise
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=404, detail=str(e)
@@ -105,3 +347,142 @@ async def chat_with_meeting(request: Request, question: MeetingQuestionRequest):
         raise HTTPException(
             status_code=500, detail=f"An error occurred: {str(e)}"
         ) from e  # Explicitly re-raise
+
+
+class _BatchPatient:
+    """A patient's query engine, opened once and shared by all its prompts."""
+
+    def __init__(self, name: str, prompts: int, timer: RequestTimer):
+        self.name = name
+        self.remaining = prompts
+        self._opened = asyncio.ensure_future(self._open(timer))
+
+    async def _open(self, timer: RequestTimer) -> Tuple[Any, str, Optional[str]]:
+        with timer.stage("open_collection"):
+            query_engine, collection_name = await open_query_engine(
+                "patient", self.name
+            )
+        version = None
+        if config.ANSWER_CACHE_ENABLED:
+            version = await asyncio.to_thread(collection_version, collection_name)
+        return query_engine, collection_name, version
+
+    async def opened(self) -> Tuple[Any, str, Optional[str]]:
+        return await asyncio.shield(self._opened)
+
+
+async def _answer_batch_question(
+    patient: _BatchPatient, prompt: str, embedding: List[float], timer: RequestTimer
+) -> str:
+    query_engine, collection_name, version = await patient.opened()
+    cache_embedding = embedding if answer_cache.semantic else None
+    if version is not None:
+        cached = answer_cache.get(collection_name, version, prompt, cache_embedding)
+        ANSWER_CACHE.inc(endpoint="ask_batch", result="hit" if cached else "miss")
+        if cached is not None:
+            return "".join(cached.tokens)
+
+    query_bundle = QueryBundle(query_str=prompt, embedding=embedding)
+    context_str = await retrieve_context(query_engine, query_bundle, timer)
+    with timer.stage("generate"):
+        answer = await acomplete(
+            QA_PROMPT.format(context_str=context_str, query_str=prompt),
+            priority=BATCH,
+        )
+    if version is not None:
+        answer_cache.put(collection_name, version, prompt, [answer], cache_embedding)
+    return answer
+
+
+async def answer_batch(
+    patient_names: List[str], prompts: List[str]
+) -> AsyncGenerator[str, None]:
+    """
+    Answer every prompt for every patient as NDJSON lines, in the order the
+    answers complete. Prompts are embedded together once, each patient's
+    index is opened once, and ASK_BATCH_CONCURRENCY questions are answered
+    at a time as batch work for the LLM governor. A question that fails gets
+    an ``error`` line instead of an ``answer``.
+    """
+    timer = RequestTimer("ask_batch")
+    try:
+        with timer.stage("embed_query"):
+            embeddings = await asyncio.to_thread(embed_prompts, prompts)
+
+        patients: Dict[str, _BatchPatient] = {}
+        results: asyncio.Queue = asyncio.Queue()
+        # Patient-major order, so each patient's engine is only held while its
+        # prompts are being answered.
+        pairs = itertools.product(patient_names, range(len(prompts)))
+
+        async def answer_pairs() -> None:
+            for patient_name, i in pairs:
+                patient = patients.get(patient_name)
+                if patient is None:
+                    patient = patients[patient_name] = _BatchPatient(
+                        patient_name, len(prompts), timer
+                    )
+                line: Dict[str, Any] = {
+                    "patient_name": patient_name,
+                    "prompt_index": i,
+                    "prompt": prompts[i],
+                }
+                try:
+                    line["answer"] = await _answer_batch_question(
+                        patient, prompts[i], embeddings[i], timer
+                    )
+                except FileNotFoundError as e:
+                    line.update(status=404, error=str(e))
+                except LLMDeadlineExceeded as e:
+                    line.update(status=503, error=str(e))
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logger.error(
+                        "Batch question failed for %s: %s", patient_name, str(e)
+                    )
+                    line.update(status=500, error=str(e))
+                patient.remaining -= 1
+                if patient.remaining == 0:
+                    del patients[patient_name]
+                results.put_nowait(line)
+
+        workers = [
+            asyncio.create_task(answer_pairs())
+            for _ in range(
+                min(config.ASK_BATCH_CONCURRENCY, len(patient_names) * len(prompts))
+            )
+        ]
+        finished = asyncio.gather(*workers)
+        finished.add_done_callback(lambda _: results.put_nowait(None))
+        try:
+            while True:
+                line = await results.get()
+                if line is None:
+                    break
+                yield json.dumps(line) + "\n"
+        finally:
+            # Workers still running here mean the client went away; stop
+            # answering questions nobody will read.
+            for worker in workers:
+                worker.cancel()
+    finally:
+        timer.finish()
+
+
+@chat_docs.post("/ask_batch", tags=["Chat with Patient Data"])
+async def chat_with_patients_batch(question: BatchQuestionRequest):
+    if not question.patient_names or not question.prompts:
+        raise HTTPException(
+            status_code=400, detail="patient_names and prompts must not be empty"
+        )
+    patient_names = list(dict.fromkeys(question.patient_names))
+    total = len(patient_names) * len(question.prompts)
+    if total > config.ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{total} questions requested; at most "
+            f"{config.ASK_BATCH_MAX_QUESTIONS} are answered per batch",
+        )
+    return StreamingResponse(
+        answer_batch(patient_names, question.prompts),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncGenerator, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.config import config
+
+CHUNK_SIZE = config.MEETING_STREAM_CHUNK_BYTES
+
+
+def validators(stat: os.stat_result) -> Dict[str, str]:
+    """ETag and Last-Modified headers for a file, derived from its stat."""
+    return {
+        "ETag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+    }
+
+
+def not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Whether a conditional GET can be answered with 304 Not Modified."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def requested_range(
+    request: Request, etag: str, size: int
+) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive byte range asked for by a single-range ``Range`` header, or
+    None to send the whole file. Raises 416 for a range outside the file.
+    """
+    header = request.headers.get("range")
+    if not header or not header.startswith("bytes="):
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        return None
+    spec = header[len("bytes=") :]
+    if "," in spec:
+        # Multipart ranges are not worth supporting for transcripts.
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+        else:
+            start, end = max(size - int(end_text), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail=f"Range not satisfiable: {header}",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+async def iter_bytes(path: str, start: int, end: int) -> AsyncGenerator[bytes, None]:
+    """Stream bytes ``start``..``end`` (inclusive) of a file without blocking."""
+    file = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(file.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(file.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(file.close)
+
+
+async def iter_json_text_field(
+    path: str, fields: Dict[str, str], text_field: str
+) -> AsyncGenerator[bytes, None]:
+    """
+    Stream ``{**fields, text_field: <content of path>}`` as a JSON object,
+    escaping the file a chunk at a time instead of loading it.
+    """
+    head = json.dumps(fields)[:-1]
+    yield f'{head}, "{text_field}": "'.encode("utf-8")
+    file = await asyncio.to_thread(open, path, "r", encoding="utf-8")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(file.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            yield json.dumps(chunk)[1:-1].encode("utf-8")
+    finally:
+        await asyncio.to_thread(file.close)
+    yield b'"}'
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.observability import tracing_overview
+from app.utils.llm_governor import llm_governor
+from app.utils.warmup import warmup_state
+
+health_router = APIRouter()
+
+
+@health_router.get("/health/live", tags=["Health"])
+async def liveness():
+    return {"status": "ok"}
+
+
+@health_router.get("/health/ready", tags=["Health"])
+async def readiness():
+    return JSONResponse(
+        content=warmup_state.to_dict(),
+        status_code=200 if warmup_state.ready else 503,
+    )
+
+
+@health_router.get("/health/tracing", tags=["Health"])
+async def tracing():
+    return tracing_overview()
+
+
+@health_router.get("/health/llm", tags=["Health"])
+async def llm():
+    return llm_governor.stats()
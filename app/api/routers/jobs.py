@@ -0,0 +1,15 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+
+from app.utils.jobs import ingestion_queue
+
+jobs_router = APIRouter()
+
+
+@jobs_router.get("/jobs/{job_id}", tags=["Ingestion Jobs"])
+async def get_job_status(job_id: str):
+    job = await asyncio.to_thread(ingestion_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
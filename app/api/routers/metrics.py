@@ -0,0 +1,28 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils.index_client import index_client
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    # Index builds, ingestion and the index cache are counted in the index
+    # owner in a multi-worker deployment, so its samples are included too.
+    others = []
+    if index_client is not None:
+        try:
+            others.append(await asyncio.to_thread(index_client.metrics))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("Could not fetch the index server's metrics: %s", str(e))
+    return PlainTextResponse(
+        registry.render(others),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,18 +1,26 @@
+import asyncio
 import logging
 import os
+from typing import Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from llama_index.core import Document
 from pydantic import BaseModel
 
+from app.api.routers import file_response
 from app.config import config
-from app.utils.index import summarize_patient_data_view
+from app.utils.catalog import patient_catalog
+from app.utils.file_cache import meeting_file_cache
+from app.utils.index import asummarize_patient_data
+from app.utils.jobs import ingestion_queue
+from app.utils.llm_governor import LLMDeadlineExceeded
+from app.utils.manifest import hash_file
+from app.utils.summary_store import summary_store
+from app.utils.uploads import UploadTooLargeError, save_upload
 
 patient_data_router = APIRouter()
 
-PATIENT_DATA_DIR = "./patient_data"
-
 
 class SummarizationRequest(BaseModel):
     patient_name: str
@@ -20,19 +28,36 @@ class SummarizationRequest(BaseModel):
 
 
 @patient_data_router.get("/patient-data", tags=["Patient Data"])
-async def get_patient_data():
+async def get_patient_data(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=config.PATIENT_DATA_PAGE_MAX),
+    prefix: str = "",
+):
     try:
+        page, next_cursor = await asyncio.to_thread(
+            patient_catalog.page, cursor=cursor, limit=limit, prefix=prefix
+        )
         patient_data = []
-        for patient in os.listdir(PATIENT_DATA_DIR):
-            patient_dir = os.path.join(PATIENT_DATA_DIR, patient)
-            if os.path.isdir(patient_dir):
-                files = [
-                    f
-                    for f in os.listdir(patient_dir)
-                    if os.path.isfile(os.path.join(patient_dir, f))
-                ]
-                patient_data.append({"patient": patient, "files": files})
-        return {"patient_data": patient_data}
+        for patient, files in page:
+            indexed_files = await asyncio.to_thread(
+                patient_catalog.indexed_files, patient
+            )
+            patient_data.append(
+                {
+                    "patient": patient,
+                    "files": [file.name for file in files],
+                    "file_details": [
+                        {
+                            "name": file.name,
+                            "size": file.size,
+                            "modified_at": file.mtime,
+                            "status": patient_catalog.file_status(file, indexed_files),
+                        }
+                        for file in files
+                    ],
+                }
+            )
+        return {"patient_data": patient_data, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error retrieving patient data: {str(e)}"
@@ -42,16 +67,51 @@ async def get_patient_data():
 @patient_data_router.get(
     "/patient-meeting-data/{patient_name}/{meeting_name}", tags=["Patient Data"]
 )
-async def get_patient_meeting_data(patient_name: str, meeting_name: str):
+async def get_patient_meeting_data(
+    request: Request, patient_name: str, meeting_name: str
+):
     try:
-        file_path = f"{PATIENT_DATA_DIR}/{patient_name}/{meeting_name}.txt"
-        with open(file_path, "r", encoding="utf-8") as file:  # Specify encoding
-            meeting_data = file.read()
-        return {
-            "patient_name": patient_name,
-            "meeting_name": meeting_name,
-            "data": meeting_data,
+        file_path = os.path.join(
+            config.PATIENT_DATA_DIR, patient_name, f"{meeting_name}.txt"
+        )
+        stat = await asyncio.to_thread(os.stat, file_path)
+
+        headers = {
+            **file_response.validators(stat),
+            "Accept-Ranges": "bytes",
+            # Let the browser keep the transcript but revalidate it each time.
+            "Cache-Control": "no-cache",
         }
+        etag = headers["ETag"]
+        if file_response.not_modified(request, etag, stat.st_mtime):
+            return Response(status_code=304, headers=headers)
+
+        byte_range = file_response.requested_range(request, etag, stat.st_size)
+        if byte_range is not None:
+            # Ranges address the raw transcript rather than the JSON envelope.
+            start, end = byte_range
+            return StreamingResponse(
+                file_response.iter_bytes(file_path, start, end),
+                status_code=206,
+                media_type="text/plain; charset=utf-8",
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{stat.st_size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+
+        fields = {"patient_name": patient_name, "meeting_name": meeting_name}
+        if not meeting_file_cache.cacheable(stat.st_size):
+            return StreamingResponse(
+                file_response.iter_json_text_field(file_path, fields, "data"),
+                media_type="application/json",
+                headers=headers,
+            )
+        meeting_data = await asyncio.to_thread(meeting_file_cache.load, file_path, etag)
+        return JSONResponse(content={**fields, "data": meeting_data}, headers=headers)
+    except HTTPException:
+        raise
     except FileNotFoundError as exc:
         raise HTTPException(
             status_code=404,
@@ -75,16 +135,34 @@ async def upload_patient_file(patient_name: str, file: UploadFile = File(...)):
         patient_dir = os.path.join(config.PATIENT_DATA_DIR, patient_name)
         os.makedirs(patient_dir, exist_ok=True)
 
-        file_path = os.path.join(patient_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
+        file_name = os.path.basename(file.filename or "")
+        if not file_name or file_name.startswith("."):
+            raise HTTPException(
+                status_code=400, detail=f"Invalid file name: {file.filename}"
+            )
+
+        file_path = os.path.join(patient_dir, file_name)
+        _, content_hash = await save_upload(
+            file, file_path, max_bytes=config.MAX_UPLOAD_BYTES
+        )
+
+        job = await asyncio.to_thread(
+            ingestion_queue.submit,
+            patient_name,
+            known_hashes={file_path: content_hash},
+        )
 
         return JSONResponse(
             content={
-                "message": f"File uploaded successfully for patient {patient_name}"
+                "message": f"File uploaded successfully for patient {patient_name}",
+                "job_id": job.id,
             },
             status_code=200,
         )
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error uploading file: {str(e)}"
@@ -108,33 +186,25 @@ async def summarize_patient_file(request: SummarizationRequest):
                     status_code=404, detail=f"File not found: {request.file_name}"
                 )
 
-        # Rest of the function remains the same
-        summary_dir = os.path.join("summarize_output", request.patient_name)
-        os.makedirs(summary_dir, exist_ok=True)
-        summary_file_path = os.path.join(
-            summary_dir,
-            f"{os.path.splitext(os.path.basename(file_path))[0]}_summary.txt",
-        )
-
-        if os.path.exists(summary_file_path):
-            with open(
-                summary_file_path, "r", encoding="utf-8"
-            ) as summary_file:  # Specify encoding
-                summary_text = summary_file.read()
-        else:
+        def read_file() -> str:
             with open(file_path, "r", encoding="utf-8") as file:  # Specify encoding
-                content = file.read()
+                return file.read()
 
-            document = Document(text=content)
-            summary = summarize_patient_data_view([document])
-            summary_text = summary.text
+        async def summarize() -> str:
+            content = await asyncio.to_thread(read_file)
+            summary = await asummarize_patient_data([Document(text=content)])
+            return summary.text
 
-            with open(
-                summary_file_path, "w", encoding="utf-8"
-            ) as summary_file:  # Specify encoding
-                summary_file.write(summary_text)
+        content_hash = await asyncio.to_thread(hash_file, file_path)
+        summary_text = await summary_store.get_or_create(content_hash, summarize)
 
         return JSONResponse(content={"summary": summary_text}, status_code=200)
+    except HTTPException:
+        raise
+    except LLMDeadlineExceeded as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        ) from e
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error summarizing file: {str(e)}"
@@ -1,9 +1,54 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+
 from fastapi import Request
 from fastapi.responses import StreamingResponse
 from llama_index.core.chat_engine.types import StreamingAgentChatResponse
 
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FlushPolicy:
+    """
+    How streamed frames are coalesced into writes: frames are buffered until
+    ``max_bytes`` are waiting or ``max_delay`` seconds have passed since the
+    first buffered frame. The first frame of a stream is always sent at once.
+    A ``max_delay`` of 0 sends every frame as its own write.
+    """
+
+    max_delay: float
+    max_bytes: int
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_delay > 0 and self.max_bytes > 0
+
+
+def _parse_flush_overrides(overrides: str) -> Dict[str, FlushPolicy]:
+    policies = {}
+    for item in filter(None, (part.strip() for part in overrides.split(","))):
+        endpoint, thresholds = item.split("=")
+        max_ms, max_bytes = thresholds.split(":")
+        policies[endpoint.strip()] = FlushPolicy(float(max_ms) / 1000, int(max_bytes))
+    return policies
+
+
+DEFAULT_FLUSH_POLICY = FlushPolicy(config.SSE_FLUSH_MS / 1000, config.SSE_FLUSH_BYTES)
+_FLUSH_POLICIES = _parse_flush_overrides(config.SSE_FLUSH_OVERRIDES)
+
+
+def flush_policy(endpoint: str) -> FlushPolicy:
+    return _FLUSH_POLICIES.get(endpoint, DEFAULT_FLUSH_POLICY)
+
 
 class VercelStreamResponse(StreamingResponse):
+    DISCONNECT_POLL_INTERVAL = 0.5
+
     @classmethod
     def convert_text(cls, token: str):
         return f"{token}\n\n"
@@ -12,8 +57,13 @@ class VercelStreamResponse(StreamingResponse):
         self,
         request: Request,
         response: StreamingAgentChatResponse,
+        on_complete: Optional[Callable[[List[str]], None]] = None,
+        policy: FlushPolicy = DEFAULT_FLUSH_POLICY,
+        on_finish: Optional[Callable[[], None]] = None,
     ):
-        content = self.content_generator(request, response)
+        content = self.content_generator(
+            request, response, on_complete, policy, on_finish
+        )
         super().__init__(content=content, media_type="text/event-stream")
 
     @classmethod
@@ -21,22 +71,128 @@ class VercelStreamResponse(StreamingResponse):
         cls,
         request: Request,
         response: StreamingAgentChatResponse,
+        on_complete: Optional[Callable[[List[str]], None]] = None,
+        policy: FlushPolicy = DEFAULT_FLUSH_POLICY,
+        on_finish: Optional[Callable[[], None]] = None,
     ):
+        tokens = []
+        completed = False
+        # Responses that can be cancelled (TokenStream) are stopped as soon as
+        # the client goes away, even while waiting for the next token.
+        cancel = getattr(response, "cancel", None)
+        watcher = (
+            asyncio.create_task(cls.watch_disconnect(request, cancel))
+            if cancel is not None
+            else None
+        )
+        # The pump reads tokens into the queue while frames already read are
+        # being written, so a slow write never holds up the generation.
+        frames: asyncio.Queue = asyncio.Queue()
+        pump = asyncio.create_task(cls.pump(response, tokens, frames))
         try:
-            if hasattr(response, "async_response_gen"):
-                async for token in response.async_response_gen():
-                    yield cls.convert_text(token)
-            elif hasattr(response, "body_iterator"):
-                async for chunk in response.body_iterator:
-                    yield cls.convert_text(chunk.decode())
-            else:
-                yield cls.convert_text(str(response))
+            async for chunk in cls.coalesce(frames, policy):
+                yield chunk
+            completed = True
         except (
             AttributeError,
             TypeError,
             ValueError,
         ) as e:  # Catch more specific exceptions
-            print(f"Error in content_generator: {e}")
+            logger.error("Error in content_generator: %s", str(e))
         finally:
+            pump.cancel()
+            if watcher is not None:
+                watcher.cancel()
+            if not completed and cancel is not None:
+                cancel()
             if await request.is_disconnected():
-                print("Client disconnected")
+                logger.info("Client disconnected")
+            elif completed and on_complete is not None:
+                on_complete(tokens)
+            if on_finish is not None:
+                on_finish()
+
+    @classmethod
+    async def iter_tokens(
+        cls, response: StreamingAgentChatResponse
+    ) -> AsyncGenerator[str, None]:
+        if hasattr(response, "async_response_gen"):
+            async for token in response.async_response_gen():
+                yield token
+        elif hasattr(response, "body_iterator"):
+            async for chunk in response.body_iterator:
+                yield chunk.decode()
+        else:
+            yield str(response)
+
+    @classmethod
+    async def pump(
+        cls,
+        response: StreamingAgentChatResponse,
+        tokens: List[str],
+        frames: asyncio.Queue,
+    ):
+        try:
+            async for token in cls.iter_tokens(response):
+                tokens.append(token)
+                # Encoded once here; StreamingResponse sends bytes as they are.
+                frames.put_nowait(cls.convert_text(token).encode("utf-8"))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            frames.put_nowait(e)  # Re-raised by the consumer
+        finally:
+            frames.put_nowait(None)
+
+    @staticmethod
+    async def coalesce(
+        frames: asyncio.Queue, policy: FlushPolicy
+    ) -> AsyncGenerator[bytes, None]:
+        loop = asyncio.get_running_loop()
+        # A get that timed out stays pending for the next round so that no
+        # frame is lost to the timeout.
+        getter: Optional[asyncio.Future] = None
+        first = True
+        try:
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(frames.get())
+                item = await getter
+                getter = None
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                if first or not policy.enabled:
+                    first = False
+                    yield item
+                    continue
+
+                buffer, size = [item], len(item)
+                deadline = loop.time() + policy.max_delay
+                while size < policy.max_bytes:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    getter = asyncio.ensure_future(frames.get())
+                    done, _ = await asyncio.wait({getter}, timeout=remaining)
+                    if not done:
+                        break
+                    item = getter.result()
+                    getter = None
+                    if item is None or isinstance(item, Exception):
+                        yield b"".join(buffer)
+                        if item is None:
+                            return
+                        raise item
+                    buffer.append(item)
+                    size += len(item)
+                yield b"".join(buffer)
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+    @classmethod
+    async def watch_disconnect(cls, request: Request, cancel: Callable[[], None]):
+        while not await request.is_disconnected():
+            await asyncio.sleep(cls.DISCONNECT_POLL_INTERVAL)
+        logger.info("Client disconnected, cancelling generation")
+        cancel()
@@ -1,5 +1,7 @@
 import logging
 import os
+import threading
+from typing import Optional
 
 # Import the automatic instrumentor from OpenInference
 from openinference.instrumentation.llama_index import LlamaIndexInstrumentor
@@ -7,41 +9,100 @@ from opentelemetry import trace as trace_api
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk import trace as trace_sdk
 from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter
+
+from app.config import config
+from app.observability import head_sampler, local_exporter, span_processor
 
 logger = logging.getLogger("dev_logger")
 
-ARIZE_SPACE_ID = os.environ["ARIZE_SPACE_ID"]
-ARIZE_API_KEY = os.environ["ARIZE_API_KEY"]
 TRACING_PROJECT_NAME = "serefine-chatbot-tracing"
-MODEL_VERSION = os.environ["ARIZE_TRACING_ENV"]
 ARIZE_ENDPOINT = "https://otlp.arize.com/v1"
 
+_setup_lock = threading.Lock()
+_tracing_enabled = None
+_tracer_provider: Optional[trace_sdk.TracerProvider] = None
+
 
-def setup_arize_client():
+def setup_arize_client() -> bool:
     """
-    This function sets up the Arize client to send OpenTelemetry traces to Arize.
-    It sets the OTEL_EXPORTER_OTLP_TRACES_HEADERS environment variable with the Arize API key and space key,
-    creates an OTLPSpanExporter, a SimpleSpanProcessor, and a TracerProvider with the resource,
-    adds the span processor to the tracer provider, sets the tracer provider as the global OpenTelemetry tracer provider,
-    and instruments the FastAPI app with the LangChainInstrumentor.
+    Set up tracing once per process and return whether it is enabled. Tracing
+    is skipped with a warning when the Arize credentials are not configured.
     """
+    global _tracing_enabled  # pylint: disable=global-statement
+    with _setup_lock:
+        if _tracing_enabled is None:
+            _tracing_enabled = _setup_arize_client()
+        return _tracing_enabled
+
+
+def _arize_exporter() -> Optional[SpanExporter]:
+    if not (config.ARIZE_SPACE_ID and config.ARIZE_API_KEY):
+        return None
     # Set the Space and API keys as headers
     os.environ["OTEL_EXPORTER_OTLP_TRACES_HEADERS"] = (
-        f"space_id={ARIZE_SPACE_ID},api_key={ARIZE_API_KEY}"
+        f"space_id={config.ARIZE_SPACE_ID},api_key={config.ARIZE_API_KEY}"
     )
+    return OTLPSpanExporter(endpoint=ARIZE_ENDPOINT)
+
+
+def _span_exporter() -> Optional[SpanExporter]:
+    kind = config.TRACING_EXPORTER
+    if kind in ("auto", "otlp"):
+        exporter = _arize_exporter()
+        if exporter is None:
+            # Spans hold patient data: they are only written locally when
+            # TRACING_EXPORTER asks for it.
+            logger.warning("ARIZE_SPACE_ID or ARIZE_API_KEY is not set, tracing is off")
+        return exporter
+    exporter = local_exporter(kind)
+    if exporter is None:
+        logger.warning("Unknown TRACING_EXPORTER %r, tracing is off", kind)
+    return exporter
+
+
+def _setup_arize_client() -> bool:
+    """
+    Install the OpenTelemetry tracer provider and instrument LlamaIndex.
+
+    Spans are head-sampled, optionally tail-sampled, and exported in batches
+    from a background thread, so tracing never adds a network round-trip to a
+    request. They go to Arize over OTLP when its credentials are set, or to a
+    local file or stdout when ``TRACING_EXPORTER`` asks for it.
+    """
+    global _tracer_provider  # pylint: disable=global-statement
+    if not config.TRACING_ENABLED:
+        logger.info("TRACING_ENABLED is false, tracing is off")
+        return False
+    span_exporter = _span_exporter()
+    if span_exporter is None:
+        return False
+
     # Set the model id and version as resource attributes
     resource = Resource(
         attributes={
             "model_id": TRACING_PROJECT_NAME,
-            "model_version": MODEL_VERSION,
+            "model_version": config.ARIZE_TRACING_ENV or "",
         }
     )
-    span_exporter = OTLPSpanExporter(endpoint=ARIZE_ENDPOINT)
-    span_processor = SimpleSpanProcessor(span_exporter=span_exporter)
-    tracer_provider = trace_sdk.TracerProvider(resource=resource)
-    tracer_provider.add_span_processor(span_processor=span_processor)
+    tracer_provider = trace_sdk.TracerProvider(
+        resource=resource, sampler=head_sampler()
+    )
+    tracer_provider.add_span_processor(span_processor(span_exporter))
     trace_api.set_tracer_provider(tracer_provider=tracer_provider)
-    LlamaIndexInstrumentor().instrument()
+    LlamaIndexInstrumentor().instrument(tracer_provider=tracer_provider)
+    _tracer_provider = tracer_provider
+
+    logger.info("Tracing enabled with %s exporter", type(span_exporter).__name__)
+    return True
+
 
-    logger.info("✅ Import and Setup Arize Client Done! Now we can start using Arize!")
+def shutdown_tracing() -> None:
+    """Flush the spans still queued for export and stop instrumenting."""
+    global _tracing_enabled  # pylint: disable=global-statement
+    with _setup_lock:
+        if _tracer_provider is None:
+            return
+        LlamaIndexInstrumentor().uninstrument()
+        _tracer_provider.shutdown()
+        _tracing_enabled = False
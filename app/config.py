@@ -10,10 +10,151 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
     AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION")
     ENVIRONMENT = os.getenv("ENVIRONMENT", "dev")
+    ARIZE_SPACE_ID = os.getenv("ARIZE_SPACE_ID")
+    ARIZE_API_KEY = os.getenv("ARIZE_API_KEY")
+    ARIZE_TRACING_ENV = os.getenv("ARIZE_TRACING_ENV")
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    # "auto" exports to Arize when its credentials are set and is off
+    # otherwise; "otlp", "file" and "console" force one.
+    TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "auto")
+    TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "./traces/spans.jsonl")
+    # The span file is rotated at this size, keeping this many old files.
+    TRACING_FILE_MAX_BYTES = int(os.getenv("TRACING_FILE_MAX_BYTES", "52428800"))
+    TRACING_FILE_BACKUPS = int(os.getenv("TRACING_FILE_BACKUPS", "3"))
+    # Strip prompts, answers and retrieved documents from exported spans.
+    TRACING_REDACT_CONTENT = (
+        os.getenv("TRACING_REDACT_CONTENT", "true").lower() == "true"
+    )
+    TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+    TRACING_TAIL_SAMPLING = (
+        os.getenv("TRACING_TAIL_SAMPLING", "false").lower() == "true"
+    )
+    # With tail sampling, failed and slow traces are always kept and this
+    # fraction of the rest.
+    TRACING_TAIL_LATENCY_MS = float(os.getenv("TRACING_TAIL_LATENCY_MS", "2000"))
+    TRACING_TAIL_KEEP_RATIO = float(os.getenv("TRACING_TAIL_KEEP_RATIO", "0.1"))
+    TRACING_TAIL_MAX_TRACES = int(os.getenv("TRACING_TAIL_MAX_TRACES", "1000"))
     STORAGE_DIR = "./chroma_db"
     PATIENT_DATA_DIR = "./patient_data"
     BEDROCK_MODEL = "anthropic.claude-3-sonnet-20240229-v1:0"
+    # "bedrock", or "mock" for the simulated LLM used by the load tests.
+    LLM_PROVIDER = os.getenv("LLM_PROVIDER", "bedrock")
+    MOCK_LLM_TOKENS_PER_SECOND = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "50"))
+    MOCK_LLM_LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", "200"))
+    MOCK_LLM_MAX_TOKENS = int(os.getenv("MOCK_LLM_MAX_TOKENS", "128"))
+    # The simulated LLM answers ThrottlingException above this many concurrent
+    # calls, like a Bedrock quota; 0 never throttles.
+    MOCK_LLM_THROTTLE_CONCURRENCY = int(os.getenv("MOCK_LLM_THROTTLE_CONCURRENCY", "0"))
+    # Throttled calls are retried by the LLM governor, which also lowers its
+    # concurrency limit, rather than by boto3 and llama-index on their own.
+    BEDROCK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "2"))
+    # Concurrent LLM calls start at LLM_MAX_CONCURRENCY, are multiplied by
+    # LLM_AIMD_DECREASE on throttling and grow by LLM_AIMD_INCREASE per
+    # limit's worth of successful calls. Batch work (patient summaries during
+    # ingestion) may use at most LLM_BATCH_SHARE of the limit.
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+    LLM_AIMD_INCREASE = float(os.getenv("LLM_AIMD_INCREASE", "1"))
+    LLM_AIMD_DECREASE = float(os.getenv("LLM_AIMD_DECREASE", "0.5"))
+    LLM_BATCH_SHARE = float(os.getenv("LLM_BATCH_SHARE", "0.5"))
+    LLM_THROTTLE_RETRIES = int(os.getenv("LLM_THROTTLE_RETRIES", "4"))
+    # Queued calls still waiting for a slot after this long are dropped;
+    # 0 waits forever.
+    LLM_INTERACTIVE_DEADLINE_SECONDS = float(
+        os.getenv("LLM_INTERACTIVE_DEADLINE_SECONDS", "30")
+    )
+    LLM_BATCH_DEADLINE_SECONDS = float(os.getenv("LLM_BATCH_DEADLINE_SECONDS", "0"))
     EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx
+    EMBEDDING_ONNX_DIR = os.getenv(
+        "EMBEDDING_ONNX_DIR", "./onnx_models/bge-small-en-v1.5"
+    )
+    EMBEDDING_ONNX_QUANTIZE = (
+        os.getenv("EMBEDDING_ONNX_QUANTIZE", "true").lower() == "true"
+    )
+    EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+    EMBEDDING_QUERY_INSTRUCTION = (
+        "Represent this question for searching relevant passages: "
+    )
+    EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "true").lower() == "true"
+    EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+    EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+    INDEX_CACHE_SIZE = int(os.getenv("INDEX_CACHE_SIZE", "64"))
+    INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+    INDEX_BUILD_WORKERS = int(os.getenv("INDEX_BUILD_WORKERS", "4"))
+    # "federated" searches the patient collections directly and keeps only the
+    # patient summaries in the global collection; "duplicated" also embeds
+    # every chunk a second time into the global collection.
+    GLOBAL_RETRIEVAL = os.getenv("GLOBAL_RETRIEVAL", "federated")
+    GLOBAL_SEARCH_WORKERS = int(os.getenv("GLOBAL_SEARCH_WORKERS", "8"))
+    # Number of uvicorn workers started by ``python main.py``. With more than
+    # one, an index-owner process holds Chroma and the embedding model and the
+    # workers reach it at INDEX_SERVER_ADDRESS.
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+    INDEX_SERVER_ADDRESS = os.getenv("INDEX_SERVER_ADDRESS", "")
+    INDEX_SERVER_AUTHKEY = os.getenv("INDEX_SERVER_AUTHKEY", "")
+    INDEX_SERVER_LISTEN = os.getenv("INDEX_SERVER_LISTEN", "127.0.0.1:8799")
+    INDEX_SERVER_CONNECT_TIMEOUT = float(
+        os.getenv("INDEX_SERVER_CONNECT_TIMEOUT", "300")
+    )
+    # Run at startup before /health/ready reports ready: load the models,
+    # embed a dummy query and open these collections.
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_COLLECTIONS = [
+        name
+        for name in os.getenv("WARMUP_COLLECTIONS", "global_patient_data").split(",")
+        if name.strip()
+    ]
+    JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "1000"))
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+    ANSWER_CACHE_MAX_BYTES = int(
+        os.getenv("ANSWER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
+    # Cosine similarity above which a differently worded prompt counts as a
+    # hit; 0 disables semantic matching.
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = float(
+        os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0")
+    )
+    SUMMARY_TOKENIZER = "cl100k_base"
+    SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "8000"))
+    SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+    # Streamed tokens are coalesced into one write every SSE_FLUSH_MS or
+    # SSE_FLUSH_BYTES, whichever comes first; 0 sends each token on its own.
+    # SSE_FLUSH_OVERRIDES sets them per endpoint: "ask_global=50:4096,...".
+    SSE_FLUSH_MS = float(os.getenv("SSE_FLUSH_MS", "20"))
+    SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", "1024"))
+    SSE_FLUSH_OVERRIDES = os.getenv("SSE_FLUSH_OVERRIDES", "")
+    # Retrieved chunks are merged, deduplicated and packed by relevance into
+    # this many prompt tokens; 0 keeps them all. Chunks sharing at least
+    # CONTEXT_DEDUP_SIMILARITY of their word trigrams count as duplicates.
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+    CONTEXT_DEDUP_SIMILARITY = float(os.getenv("CONTEXT_DEDUP_SIMILARITY", "0.9"))
+    # /ask_batch answers at most ASK_BATCH_MAX_QUESTIONS patient x prompt
+    # pairs per request, ASK_BATCH_CONCURRENCY of them at a time.
+    ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "10000"))
+    ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "8"))
+    TRANSCRIPT_WINDOW_SECONDS = float(os.getenv("TRANSCRIPT_WINDOW_SECONDS", "60"))
+    SUMMARY_STORE_DIR = os.getenv("SUMMARY_STORE_DIR", "./summarize_output/store")
+    SUMMARY_STORE_MAX_BYTES = int(
+        os.getenv("SUMMARY_STORE_MAX_BYTES", str(256 * 1024 * 1024))
+    )
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+    CATALOG_WATCH_ENABLED = os.getenv("CATALOG_WATCH_ENABLED", "true").lower() == "true"
+    # Queue ingestion for files that appear in patient_data outside of uploads.
+    CATALOG_AUTO_INGEST = os.getenv("CATALOG_AUTO_INGEST", "true").lower() == "true"
+    PATIENT_DATA_PAGE_MAX = int(os.getenv("PATIENT_DATA_PAGE_MAX", "500"))
+    MEETING_CACHE_MAX_BYTES = int(
+        os.getenv("MEETING_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
+    # Larger meeting files are streamed from disk instead of cached.
+    MEETING_CACHE_MAX_FILE_BYTES = int(
+        os.getenv("MEETING_CACHE_MAX_FILE_BYTES", str(1024 * 1024))
+    )
+    MEETING_STREAM_CHUNK_BYTES = int(
+        os.getenv("MEETING_STREAM_CHUNK_BYTES", str(64 * 1024))
+    )
     SYSTEM_PROMPT = """
 You are a helpful and knowledgeable assistant developed by Xloop Digital for Serefine, a company specializing in autism diagnosis and treatment. Your role is to provide accurate and clear guidance about patient data, autism-related information, and Serefine's processes.
 
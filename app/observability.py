@@ -1,6 +1,28 @@
+import logging
 import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional, Sequence
 
 import llama_index.core
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import StatusCode
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
 
 
 def init_observability():
@@ -11,3 +33,321 @@ def init_observability():
     llama_index.core.set_global_handler(
         "arize_phoenix", endpoint="https://llamatrace.com/v1/traces"
     )
+
+
+@dataclass
+class TracingStats:  # pylint: disable=too-many-instance-attributes
+    spans_started: int = 0
+    spans_ended: int = 0
+    spans_dropped: int = 0
+    spans_exported: int = 0
+    export_failures: int = 0
+    traces_kept: int = 0
+    traces_dropped: int = 0
+    # Time spent in span processor hooks, i.e. on the request threads.
+    request_path_seconds: float = 0.0
+    # Time spent exporting, on the batch processor's own thread.
+    export_seconds: float = 0.0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def add(self, **amounts: float) -> None:
+        """Add to the named counters; called from request and exporter threads."""
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stats = {
+                f.name: getattr(self, f.name)
+                for f in fields(self)
+                if not f.name.startswith("_")
+            }
+        stats["request_path_us_per_span"] = (
+            stats["request_path_seconds"] / stats["spans_ended"] * 1e6
+            if stats["spans_ended"]
+            else 0.0
+        )
+        return stats
+
+
+tracing_stats = TracingStats()
+
+
+class MeasuredExporter(SpanExporter):
+    """Wraps an exporter to count what it exports and how long it takes."""
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        started = time.perf_counter()
+        try:
+            result = self.exporter.export(spans)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("Span export failed: %s", str(e))
+            result = SpanExportResult.FAILURE
+        elapsed = time.perf_counter() - started
+        if result == SpanExportResult.SUCCESS:
+            tracing_stats.add(export_seconds=elapsed, spans_exported=len(spans))
+        else:
+            tracing_stats.add(export_seconds=elapsed, export_failures=len(spans))
+        return result
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+
+class MeasuringProcessor(SpanProcessor):
+    """
+    Wraps the span processing pipeline to count spans and the time its hooks
+    take on the request threads.
+    """
+
+    def __init__(self, delegate: SpanProcessor):
+        self.delegate = delegate
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        started = time.perf_counter()
+        self.delegate.on_start(span, parent_context=parent_context)
+        tracing_stats.add(
+            spans_started=1, request_path_seconds=time.perf_counter() - started
+        )
+
+    def on_end(self, span: ReadableSpan) -> None:
+        started = time.perf_counter()
+        self.delegate.on_end(span)
+        tracing_stats.add(
+            spans_ended=1, request_path_seconds=time.perf_counter() - started
+        )
+
+    def shutdown(self) -> None:
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """
+    Holds the spans of each trace until its local root ends, then forwards the
+    whole trace to ``delegate`` if it failed, took at least ``latency_threshold``
+    seconds, or falls in the ``keep_ratio`` random sample; otherwise the trace
+    is dropped. At most ``max_traces`` traces are buffered, oldest dropped
+    first. Only the hooks run on request threads; they never do I/O.
+    """
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        latency_threshold: float,
+        keep_ratio: float,
+        max_traces: int,
+    ):
+        self.delegate = delegate
+        self.latency_threshold = latency_threshold
+        self.keep_ratio = keep_ratio
+        self.max_traces = max_traces
+        self._lock = threading.Lock()
+        self._traces: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        with self._lock:
+            spans = self._traces.setdefault(trace_id, [])
+            spans.append(span)
+            if span.parent is None or span.parent.is_remote:
+                del self._traces[trace_id]
+            else:
+                spans = None
+                while len(self._traces) > self.max_traces:
+                    _, dropped = self._traces.popitem(last=False)
+                    tracing_stats.add(spans_dropped=len(dropped), traces_dropped=1)
+        if spans is not None:
+            if self._keep(span, spans):
+                tracing_stats.add(traces_kept=1)
+                for ended in spans:
+                    self.delegate.on_end(ended)
+            else:
+                tracing_stats.add(traces_dropped=1, spans_dropped=len(spans))
+
+    def _keep(self, root: ReadableSpan, spans: List[ReadableSpan]) -> bool:
+        if any(span.status.status_code == StatusCode.ERROR for span in spans):
+            return True
+        duration = (root.end_time - root.start_time) / 1e9
+        if duration >= self.latency_threshold:
+            return True
+        return random.random() < self.keep_ratio
+
+    def shutdown(self) -> None:
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+
+REDACTED = "__REDACTED__"
+# Span attributes carrying prompts, answers and patient documents.
+SENSITIVE_ATTRIBUTES = ("input.value", "output.value")
+SENSITIVE_PREFIXES = (
+    "retrieval.documents.",
+    "reranker.",
+    "embedding.embeddings.",
+    "llm.input_messages.",
+    "llm.output_messages.",
+    "llm.prompts",
+    "llm.prompt_template.variables",
+)
+
+
+def _is_sensitive(key: str) -> bool:
+    return key in SENSITIVE_ATTRIBUTES or key.startswith(SENSITIVE_PREFIXES)
+
+
+def redact(span: ReadableSpan) -> ReadableSpan:
+    """A copy of ``span`` with its content attributes replaced by REDACTED."""
+    attributes = span.attributes or {}
+    if not any(_is_sensitive(key) for key in attributes):
+        return span
+    return ReadableSpan(
+        name=span.name,
+        context=span.context,
+        parent=span.parent,
+        resource=span.resource,
+        attributes={
+            key: REDACTED if _is_sensitive(key) else value
+            for key, value in attributes.items()
+        },
+        events=span.events,
+        links=span.links,
+        kind=span.kind,
+        status=span.status,
+        start_time=span.start_time,
+        end_time=span.end_time,
+        instrumentation_scope=span.instrumentation_scope,
+    )
+
+
+class RedactingExporter(SpanExporter):
+    """Wraps an exporter to strip content attributes before export."""
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        return self.exporter.export([redact(span) for span in spans])
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+
+class RotatingFileExporter(SpanExporter):
+    """
+    Appends one JSON span per line to ``path``. Once the file reaches
+    ``max_bytes`` it is renamed to ``path.1`` (and older files shifted up to
+    ``path.<backups>``, the oldest deleted) and a new file is started.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._out = self._open()
+
+    def _open(self):
+        # pylint: disable=consider-using-with
+        return open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self) -> None:
+        self._out.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                older = f"{self.path}.{index}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._out = self._open()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        with self._lock:
+            if self._out.closed:
+                return SpanExportResult.FAILURE
+            self._out.write(lines)
+            self._out.flush()
+            if 0 < self.max_bytes <= self._out.tell():
+                self._rotate()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._out.close()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def local_exporter(kind: str) -> Optional[SpanExporter]:
+    """Exporter writing one JSON span per line to stdout or to a file."""
+    if kind == "console":
+        return ConsoleSpanExporter(
+            out=sys.stdout, formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    if kind == "file":
+        return RotatingFileExporter(
+            config.TRACING_FILE_PATH,
+            max_bytes=config.TRACING_FILE_MAX_BYTES,
+            backups=config.TRACING_FILE_BACKUPS,
+        )
+    return None
+
+
+def head_sampler() -> ParentBased:
+    """Samples ``TRACING_SAMPLE_RATE`` of new traces, following the parent."""
+    return ParentBased(TraceIdRatioBased(config.TRACING_SAMPLE_RATE))
+
+
+def span_processor(exporter: SpanExporter) -> SpanProcessor:
+    """
+    Batching pipeline for ``exporter``: spans are queued in memory and
+    exported from a background thread, behind tail sampling when enabled.
+    Content attributes are redacted unless ``TRACING_REDACT_CONTENT`` is off.
+    """
+    if config.TRACING_REDACT_CONTENT:
+        exporter = RedactingExporter(exporter)
+    processor: SpanProcessor = BatchSpanProcessor(MeasuredExporter(exporter))
+    if config.TRACING_TAIL_SAMPLING:
+        processor = TailSamplingProcessor(
+            processor,
+            latency_threshold=config.TRACING_TAIL_LATENCY_MS / 1000,
+            keep_ratio=config.TRACING_TAIL_KEEP_RATIO,
+            max_traces=config.TRACING_TAIL_MAX_TRACES,
+        )
+    return MeasuringProcessor(processor)
+
+
+def tracing_overview() -> Dict[str, object]:
+    return {
+        "enabled": config.TRACING_ENABLED,
+        "exporter": config.TRACING_EXPORTER,
+        "redact_content": config.TRACING_REDACT_CONTENT,
+        "sample_rate": config.TRACING_SAMPLE_RATE,
+        **tracing_stats.to_dict(),
+    }
@@ -0,0 +1,182 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.config import config
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _WHITESPACE.sub(" ", prompt).strip().rstrip("?!. ").lower()
+
+
+@dataclass
+class CachedAnswer:
+    tokens: List[str]
+    embedding: Optional[np.ndarray]
+    created_at: float
+    size: int
+
+
+class CachedResponse:
+    """Replays a cached answer through VercelStreamResponse token by token."""
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+
+    async def async_response_gen(self):
+        for token in self.tokens:
+            yield token
+
+    def __str__(self) -> str:
+        return "".join(self.tokens)
+
+
+class AnswerCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Answers keyed on (collection, data version, normalized prompt).
+
+    The data version changes whenever the collection's files change, so stale
+    answers are never served; ``invalidate`` also drops them eagerly to free
+    memory. With ``similarity_threshold`` set, a prompt whose embedding is
+    close enough to a cached prompt for the same collection version is a hit
+    too. Entries expire after ``ttl_seconds`` and are evicted in LRU order to
+    stay within ``max_entries`` and ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        similarity_threshold: float = 0.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, str], CachedAnswer]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold > 0
+
+    def get(
+        self,
+        collection: str,
+        version: str,
+        prompt: str,
+        embedding: Optional[List[float]] = None,
+    ) -> Optional[CachedAnswer]:
+        key = (collection, version, normalize_prompt(prompt))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if self.semantic and embedding is not None:
+                match = self._closest(collection, version, np.asarray(embedding), now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match]
+            self.misses += 1
+            return None
+
+    def _closest(self, collection: str, version: str, embedding: np.ndarray, now):
+        best_key, best_score = None, self.similarity_threshold
+        norm = np.linalg.norm(embedding) or 1.0
+        for key, entry in self._entries.items():
+            if key[0] != collection or key[1] != version or entry.embedding is None:
+                continue
+            if self._expired(entry, now):
+                continue
+            score = float(
+                np.dot(embedding, entry.embedding)
+                / (norm * (np.linalg.norm(entry.embedding) or 1.0))
+            )
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def put(
+        self,
+        collection: str,
+        version: str,
+        prompt: str,
+        tokens: List[str],
+        embedding: Optional[List[float]] = None,
+    ) -> None:
+        if not "".join(tokens).strip():
+            return
+        key = (collection, version, normalize_prompt(prompt))
+        entry = CachedAnswer(
+            tokens=list(tokens),
+            embedding=np.asarray(embedding) if embedding is not None else None,
+            created_at=time.time(),
+            size=sum(len(token) for token in tokens) + len(key[2]),
+        )
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, collection: str) -> None:
+        """Drop answers for ``collection`` and its scopes (``collection/...``)."""
+        scope_prefix = f"{collection}/"
+        with self._lock:
+            for key in [
+                key
+                for key in self._entries
+                if key[0] == collection or key[0].startswith(scope_prefix)
+            ]:
+                self._remove(key)
+
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+answer_cache = AnswerCache(
+    max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=config.ANSWER_CACHE_MAX_BYTES,
+    ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+    similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
@@ -0,0 +1,191 @@
+import asyncio
+import bisect
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from watchfiles import awatch
+
+from app.config import config
+from app.utils.answer_cache import answer_cache
+from app.utils.index import (
+    GLOBAL_COLLECTION_NAME,
+    list_patients,
+    patient_collection_name,
+)
+from app.utils.index_client import index_client
+from app.utils.jobs import ingestion_queue
+from app.utils.manifest import get_manifest, list_data_files
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CatalogFile:
+    name: str
+    path: str
+    size: int
+    mtime: float
+
+
+def _visible(_, path: str) -> bool:
+    # Skips in-progress uploads (".upload-*.part") and other hidden files.
+    return not os.path.basename(path).startswith(".")
+
+
+class PatientCatalog:
+    """
+    In-memory index of the patient data directory: every patient and, for
+    each of their files, its size and mtime. Built once with a full scan and
+    then kept current by watching the directory, so listing patients never
+    touches the disk. Every change is reported to the ``on_change`` listeners
+    with the set of affected patients. In a multi-worker deployment only the
+    index owner keeps a catalog, and the workers page through the owner's.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._patients: Dict[str, Dict[str, CatalogFile]] = {}
+        self._names: List[str] = []
+        self._scanned = False
+        self._listeners: List[Callable[[Set[str]], None]] = []
+
+    def on_change(self, listener: Callable[[Set[str]], None]) -> None:
+        self._listeners.append(listener)
+
+    def _read_patient(self, patient: str) -> Optional[Dict[str, CatalogFile]]:
+        patient_dir = os.path.join(self.root, patient)
+        if not os.path.isdir(patient_dir):
+            return None
+        files = {}
+        for path in list_data_files(patient_dir):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            name = os.path.relpath(path, patient_dir)
+            files[name] = CatalogFile(
+                name=name, path=path, size=stat.st_size, mtime=stat.st_mtime
+            )
+        return files
+
+    def _store(self, patient: str, files: Optional[Dict[str, CatalogFile]]) -> None:
+        with self._lock:
+            if files is None:
+                if self._patients.pop(patient, None) is not None:
+                    self._names.remove(patient)
+            else:
+                if patient not in self._patients:
+                    bisect.insort(self._names, patient)
+                self._patients[patient] = files
+
+    def scan(self) -> None:
+        with self._scan_lock:
+            os.makedirs(self.root, exist_ok=True)
+            patients = list_patients()
+            for patient in patients:
+                self._store(patient, self._read_patient(patient))
+            for patient in set(self._patients) - set(patients):
+                self._store(patient, None)
+            self._scanned = True
+            logger.info("Catalogued %d patients in %s", len(patients), self.root)
+
+    def ensure_scanned(self) -> None:
+        if not self._scanned:
+            self.scan()
+
+    def refresh(self, patients: Set[str]) -> None:
+        for patient in patients:
+            self._store(patient, self._read_patient(patient))
+        for listener in self._listeners:
+            try:
+                listener(patients)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error("Catalog listener failed for %s: %s", patients, str(e))
+
+    def _patient_of(self, path: str) -> Optional[str]:
+        relative = os.path.relpath(path, os.path.abspath(self.root))
+        patient = relative.split(os.sep)[0]
+        if patient in (".", "..") or patient.startswith("."):
+            return None
+        return patient
+
+    async def watch(self, stop_event: asyncio.Event) -> None:
+        """Apply filesystem changes until ``stop_event`` is set."""
+        await asyncio.to_thread(self.ensure_scanned)
+        async for changes in awatch(
+            self.root, watch_filter=_visible, stop_event=stop_event
+        ):
+            patients = {self._patient_of(path) for _, path in changes} - {None}
+            if patients:
+                logger.info("Patient data changed for %s", ", ".join(sorted(patients)))
+                await asyncio.to_thread(self.refresh, patients)
+
+    def has_patient(self, patient: str) -> bool:
+        with self._lock:
+            return patient in self._patients
+
+    def indexed_files(self, patient: str) -> Dict[str, Tuple[float, int]]:
+        """``(mtime, size)`` of each file as last ingested, by path."""
+        if index_client is not None:
+            return index_client.indexed_files(patient)
+        manifest = get_manifest(patient_collection_name(patient))
+        return {
+            path: (entry.mtime, entry.size) for path, entry in manifest.files.items()
+        }
+
+    @staticmethod
+    def file_status(
+        file: CatalogFile, indexed_files: Dict[str, Tuple[float, int]]
+    ) -> str:
+        indexed = indexed_files.get(file.path)
+        if indexed is None:
+            return "pending"
+        if indexed == (file.mtime, file.size):
+            return "indexed"
+        return "stale"
+
+    def page(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        prefix: str = "",
+    ) -> Tuple[List[Tuple[str, List[CatalogFile]]], Optional[str]]:
+        """
+        Patients in name order starting after ``cursor``, optionally only
+        those whose name starts with ``prefix``. Returns the page and the
+        cursor for the next one (None on the last page).
+        """
+        if index_client is not None:
+            return index_client.catalog_page(cursor, limit, prefix)
+        self.ensure_scanned()
+        with self._lock:
+            start = bisect.bisect_right(self._names, cursor) if cursor else 0
+            if prefix:
+                start = max(start, bisect.bisect_left(self._names, prefix))
+            page = []
+            for name in self._names[start:]:
+                if not name.startswith(prefix):
+                    break
+                if limit is not None and len(page) == limit:
+                    return page, page[-1][0]
+                page.append((name, list(self._patients[name].values())))
+        return page, None
+
+
+def reindex_changed(patients: Set[str]) -> None:
+    answer_cache.invalidate(GLOBAL_COLLECTION_NAME)
+    for patient in patients:
+        answer_cache.invalidate(patient_collection_name(patient))
+        # Uploads have already queued their job, which this one joins while it
+        # is still pending; otherwise the manifest makes the re-sync cheap.
+        if config.CATALOG_AUTO_INGEST and patient_catalog.has_patient(patient):
+            ingestion_queue.submit(patient)
+
+
+patient_catalog = PatientCatalog(root=config.PATIENT_DATA_DIR)
+patient_catalog.on_change(reindex_changed)
@@ -0,0 +1,216 @@
+import logging
+import re
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from llama_index.core import QueryBundle
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore
+
+from app.utils.llm import count_tokens
+from app.utils.metrics import CONTEXT_TOKENS
+from app.utils.summarize import get_encoding
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def _score(node: NodeWithScore) -> float:
+    return node.score or 0.0
+
+
+def _tokens(node: NodeWithScore) -> int:
+    return count_tokens(node.node.get_content(metadata_mode=MetadataMode.LLM))
+
+
+class TokenCounts:
+    """
+    Remembers the token count of each node. Merged nodes are new objects
+    every time, so nodes are told apart by ID, character range and text
+    length, which together fix their content.
+    """
+
+    def __init__(self):
+        self._counts: Dict[Tuple, int] = {}
+
+    def __call__(self, node: NodeWithScore) -> int:
+        key = (
+            node.node.node_id,
+            node.node.start_char_idx,
+            node.node.end_char_idx,
+            len(node.node.text),
+        )
+        count = self._counts.get(key)
+        if count is None:
+            count = self._counts[key] = _tokens(node)
+        return count
+
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return frozenset([" ".join(words)])
+    return frozenset(
+        " ".join(words[i : i + size]) for i in range(len(words) - size + 1)
+    )
+
+
+def _overlap(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """How much of the smaller text the larger one already contains."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def merge_adjacent(nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+    """
+    Join chunks of the same document whose character ranges touch or
+    overlap into one node, dropping the overlapping text. The merged node
+    keeps the best score of its parts.
+    """
+    merged: List[NodeWithScore] = []
+    spans = {}
+    for node in nodes:
+        doc_id = node.node.ref_doc_id
+        start, end = node.node.start_char_idx, node.node.end_char_idx
+        if doc_id is None or start is None or end is None:
+            merged.append(node)
+        else:
+            spans.setdefault(doc_id, []).append(node)
+
+    for parts in spans.values():
+        parts.sort(key=lambda node: node.node.start_char_idx)
+        current = parts[0]
+        for part in parts[1:]:
+            current_end = current.node.end_char_idx
+            if part.node.start_char_idx > current_end:
+                merged.append(current)
+                current = part
+                continue
+            score = max(_score(current), _score(part))
+            if part.node.end_char_idx <= current_end:
+                # Entirely inside the current span.
+                current = NodeWithScore(node=current.node, score=score)
+                continue
+            node = current.node.model_copy()
+            node.text = (
+                current.node.text
+                + part.node.text[current_end - part.node.start_char_idx :]
+            )
+            node.end_char_idx = part.node.end_char_idx
+            current = NodeWithScore(node=node, score=score)
+        merged.append(current)
+    return merged
+
+
+def drop_near_duplicates(
+    nodes: List[NodeWithScore], threshold: float
+) -> List[NodeWithScore]:
+    """
+    Drop nodes whose text is mostly contained in another node's, e.g. the
+    same passage uploaded twice. The longer text is kept, with the better
+    score of the two.
+    """
+    kept: List[NodeWithScore] = []
+    shingles: List[FrozenSet[str]] = []
+    for node in sorted(nodes, key=lambda node: len(node.node.text), reverse=True):
+        own = _shingles(node.node.text)
+        for i, other in enumerate(shingles):
+            if _overlap(own, other) >= threshold:
+                score = max(_score(kept[i]), _score(node))
+                kept[i] = NodeWithScore(node=kept[i].node, score=score)
+                break
+        else:
+            kept.append(node)
+            shingles.append(own)
+    return kept
+
+
+def _truncate(
+    node: NodeWithScore, max_tokens: int, tokens: Callable[[NodeWithScore], int]
+) -> Optional[NodeWithScore]:
+    overhead = tokens(node) - count_tokens(node.node.text)
+    budget = max_tokens - overhead
+    if budget <= 0:
+        return None
+    encoding = get_encoding()
+    truncated = node.node.model_copy()
+    truncated.text = encoding.decode(encoding.encode(node.node.text)[:budget])
+    return NodeWithScore(node=truncated, score=node.score)
+
+
+def _by_score(nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+    return sorted(nodes, key=_score, reverse=True)
+
+
+def pack(
+    nodes: List[NodeWithScore],
+    token_budget: int,
+    tokens: Optional[TokenCounts] = None,
+) -> List[NodeWithScore]:
+    """
+    The most relevant nodes that fit in ``token_budget`` tokens once
+    adjacent chunks are merged, best first. Each node is costed after
+    merging with those already chosen, so overlapping chunks only pay for
+    their new text. Nodes that don't fit are skipped so smaller ones further
+    down can still be used; if not even the best node fits, it is cut to size.
+    Only merged nodes that changed are counted again, through ``tokens``.
+    """
+    tokens = tokens or TokenCounts()
+    ranked = _by_score(nodes)
+    if token_budget <= 0:
+        return _by_score(merge_adjacent(ranked))
+    chosen: List[NodeWithScore] = []
+    packed: List[NodeWithScore] = []
+    for node in ranked:
+        candidate = merge_adjacent(chosen + [node])
+        if sum(tokens(merged) for merged in candidate) <= token_budget:
+            chosen.append(node)
+            packed = candidate
+    if not packed and ranked:
+        truncated = _truncate(ranked[0], token_budget, tokens)
+        if truncated is not None:
+            packed.append(truncated)
+    return _by_score(packed)
+
+
+class ContextPacker(BaseNodePostprocessor):
+    """
+    Assembles the retrieved nodes into the context sent to the LLM:
+    near-duplicates are dropped, and what is left is packed by relevance
+    into ``token_budget`` tokens (0 for no limit) with adjacent chunks of a
+    document merged. Logs and counts the prompt tokens this saves.
+    """
+
+    token_budget: int = 4000
+    similarity_threshold: float = 0.9
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextPacker"
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if not nodes:
+            return nodes
+        tokens = TokenCounts()
+        retrieved = sum(tokens(node) for node in nodes)
+        packed = nodes
+        if self.similarity_threshold > 0:
+            packed = drop_near_duplicates(packed, self.similarity_threshold)
+        packed = pack(packed, self.token_budget, tokens)
+        used = sum(tokens(node) for node in packed)
+        CONTEXT_TOKENS.inc(retrieved, stage="retrieved")
+        CONTEXT_TOKENS.inc(used, stage="packed")
+        logger.info(
+            "Packed context: %d nodes -> %d, %d -> %d tokens (%d saved)",
+            len(nodes),
+            len(packed),
+            retrieved,
+            used,
+            retrieved - used,
+        )
+        return packed
@@ -0,0 +1,359 @@
+import asyncio
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+QUERY = "query"
+TEXT = "text"
+
+# Queries are latency sensitive, so they jump ahead of bulk ingestion texts.
+_PRIORITY = {QUERY: 0, TEXT: 1}
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def embed_texts(model: BaseEmbedding, kind: str, texts: List[str]) -> List[Embedding]:
+    # HuggingFaceEmbedding (and the ONNX backend) embed a whole batch in one
+    # forward pass and select the query/text instruction by prompt name.
+    if hasattr(model, "_embed"):
+        return model._embed(texts, prompt_name=kind)  # pylint: disable=W0212
+    if kind == QUERY:
+        return [model.get_query_embedding(text) for text in texts]
+    return model.get_text_embedding_batch(texts)
+
+
+@dataclass(order=True)
+class _Request:
+    priority: int
+    seq: int
+    kind: str = field(compare=False)
+    text: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: Future = field(compare=False)
+
+
+class EmbeddingBatcher:  # pylint: disable=too-many-instance-attributes
+    """
+    Collects embedding calls from any thread and runs them through the model
+    in batches. A batch is dispatched as soon as ``max_batch_size`` requests
+    are waiting or ``max_wait_ms`` has passed since the oldest one arrived, so
+    a lone request pays at most ``max_wait_ms`` of extra latency.
+    """
+
+    def __init__(self, model: BaseEmbedding, max_batch_size: int, max_wait_ms: float):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.PriorityQueue[_Request]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_batch = 0
+        self._batch_size_counts: Dict[int, int] = {b: 0 for b in BATCH_SIZE_BUCKETS}
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+        self._thread = threading.Thread(
+            target=self._run, name="embedding-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, kind: str, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put(
+            _Request(
+                priority=_PRIORITY[kind],
+                seq=next(self._seq),
+                kind=kind,
+                text=text,
+                enqueued_at=time.perf_counter(),
+                future=future,
+            )
+        )
+        return future
+
+    def embed(self, kind: str, texts: List[str]) -> List[Embedding]:
+        futures = [self.submit(kind, text) for text in texts]
+        return [future.result() for future in futures]
+
+    async def aembed(self, kind: str, texts: List[str]) -> List[Embedding]:
+        futures = [asyncio.wrap_future(self.submit(kind, text)) for text in texts]
+        return list(await asyncio.gather(*futures))
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                # Whatever is already queued is taken without waiting.
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._record(batch, started)
+            for kind in (QUERY, TEXT):
+                requests = [r for r in batch if r.kind == kind]
+                if not requests:
+                    continue
+                try:
+                    embeddings = embed_texts(
+                        self.model, kind, [r.text for r in requests]
+                    )
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logger.error("Embedding batch of %d failed: %s", len(requests), e)
+                    for request in requests:
+                        request.future.set_exception(e)
+                    continue
+                for request, embedding in zip(requests, embeddings):
+                    request.future.set_result(embedding)
+
+    def _record(self, batch: List[_Request], started: float) -> None:
+        size = len(batch)
+        waits = [started - request.enqueued_at for request in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._max_batch = max(self._max_batch, size)
+            bucket = next((b for b in BATCH_SIZE_BUCKETS if size <= b), None)
+            if bucket is not None:
+                self._batch_size_counts[bucket] += 1
+            self._queue_time_total += sum(waits)
+            self._queue_time_max = max(self._queue_time_max, *waits)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_size": self._items / self._batches if self._batches else 0,
+                "max_batch_size": self._max_batch,
+                "batch_size_counts": dict(self._batch_size_counts),
+                "avg_queue_ms": (
+                    self._queue_time_total / self._items * 1000 if self._items else 0
+                ),
+                "max_queue_ms": self._queue_time_max * 1000,
+            }
+
+
+class BatchingEmbedding(BaseEmbedding):
+    """Embedding model that routes every call through an EmbeddingBatcher."""
+
+    _batcher: EmbeddingBatcher = PrivateAttr()
+
+    def __init__(
+        self,
+        model: BaseEmbedding,
+        max_batch_size: int,
+        max_wait_ms: float,
+        **kwargs: Any,
+    ):
+        super().__init__(
+            model_name=model.model_name,
+            embed_batch_size=max_batch_size,
+            **kwargs,
+        )
+        self._batcher = EmbeddingBatcher(model, max_batch_size, max_wait_ms)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BatchingEmbedding"
+
+    @property
+    def batcher(self) -> EmbeddingBatcher:
+        return self._batcher
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._batcher.embed(QUERY, [query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return (await self._batcher.aembed(QUERY, [query]))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._batcher.embed(TEXT, [text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._batcher.aembed(TEXT, [text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._batcher.embed(TEXT, texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await self._batcher.aembed(TEXT, texts)
+
+
+def embed_queries(model: BaseEmbedding, queries: List[str]) -> List[Embedding]:
+    """Embed many queries in as few forward passes as the model allows."""
+    if isinstance(model, BatchingEmbedding):
+        return model.batcher.embed(QUERY, queries)
+    return embed_texts(model, QUERY, queries)
+
+
+def _l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def onnx_model_path(model_dir: str, quantized: bool) -> str:
+    return os.path.join(
+        model_dir, "model_quantized.onnx" if quantized else "model.onnx"
+    )
+
+
+def export_onnx_model(model_name: str, model_dir: str, quantize: bool) -> str:
+    """
+    Export ``model_name`` to ONNX (and optionally int8-quantize it) into
+    ``model_dir``. This is the only place torch is needed for the ONNX backend;
+    it runs once per host and the result is reused on every later start.
+    """
+    # pylint: disable=import-outside-toplevel
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["export"], return_tensors="pt")
+    input_names = [
+        name
+        for name in ("input_ids", "attention_mask", "token_type_ids")
+        if name in sample
+    ]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = onnx_model_path(model_dir, quantized=False)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(model_dir)
+    logger.info("Exported %s to %s", model_name, fp32_path)
+
+    if not quantize:
+        return fp32_path
+    int8_path = onnx_model_path(model_dir, quantized=True)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    logger.info("Quantized %s to %s", model_name, int8_path)
+    return int8_path
+
+
+class OnnxEmbedding(BaseEmbedding):
+    """
+    CPU embedding backend running a BERT-style sentence embedding model (CLS
+    pooling, L2-normalised, as used by the BGE family) on ONNX Runtime, with
+    optional int8 dynamic quantization.
+    """
+
+    query_instruction: str = ""
+    text_instruction: str = ""
+    max_length: int = 512
+
+    _session: Any = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+    _input_names: List[str] = PrivateAttr()
+
+    def __init__(
+        self,
+        model_name: str,
+        model_dir: str,
+        quantized: bool = True,
+        num_threads: int = 0,
+        **kwargs: Any,
+    ):
+        super().__init__(model_name=model_name, **kwargs)
+        # pylint: disable=import-outside-toplevel
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = onnx_model_path(model_dir, quantized)
+        if not os.path.exists(model_path):
+            logger.warning("No ONNX model at %s, exporting %s", model_path, model_name)
+            model_path = export_onnx_model(model_name, model_dir, quantized)
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = [i.name for i in self._session.get_inputs()]
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=self.max_length)
+        self._tokenizer.enable_padding()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OnnxEmbedding"
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        features = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array(
+                [e.attention_mask for e in encodings], dtype=np.int64
+            ),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        (hidden_state,) = self._session.run(
+            ["last_hidden_state"],
+            {name: features[name] for name in self._input_names},
+        )
+        return _l2_normalize(hidden_state[:, 0])
+
+    def _embed(
+        self, sentences: List[str], prompt_name: Optional[str] = None
+    ) -> List[Embedding]:
+        instruction = (
+            self.query_instruction if prompt_name == QUERY else self.text_instruction
+        )
+        texts = [f"{instruction}{sentence}" for sentence in sentences]
+        embeddings = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            batch = texts[start : start + self.embed_batch_size]
+            embeddings.extend(self._run(batch).tolist())
+        return embeddings
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._embed([query], prompt_name=QUERY)[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._embed([text], prompt_name=TEXT)[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._embed(texts, prompt_name=TEXT)
@@ -7,4 +7,5 @@ async def http_error_handler(request: Request, exc: HTTPException) -> JSONRespon
     return JSONResponse(
         {"errors": [{"status": exc.status_code, "detail": exc.detail}]},
         status_code=exc.status_code,
+        headers=exc.headers,
     )
@@ -0,0 +1,77 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class TextFileCache:
+    """
+    Bounded LRU cache of small text files, keyed by path and validated by the
+    caller's ETag so an edited file is re-read rather than served stale. Files
+    larger than ``max_file_bytes`` are never cached.
+    """
+
+    def __init__(self, max_bytes: int, max_file_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, size: int) -> bool:
+        return size <= self.max_file_bytes
+
+    def get(self, path: str, etag: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, path: str, etag: str, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if not self.cacheable(size):
+            return
+        with self._lock:
+            self._remove(path)
+            self._entries[path] = (etag, text)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def load(self, path: str, etag: str) -> str:
+        """Cached text of ``path``, reading it on a miss. Blocking."""
+        text = self.get(path, etag)
+        if text is None:
+            with open(path, "r", encoding="utf-8") as file:
+                text = file.read()
+            self.put(path, etag, text)
+        return text
+
+    def _remove(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._bytes -= len(entry[1].encode("utf-8"))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+meeting_file_cache = TextFileCache(
+    max_bytes=config.MEETING_CACHE_MAX_BYTES,
+    max_file_bytes=config.MEETING_CACHE_MAX_FILE_BYTES,
+)
@@ -1,24 +1,45 @@
+import asyncio
+import hashlib
+import json
 import logging
 import os
-from typing import List, Tuple
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
 import boto3
 import botocore
-import chromadb
 from botocore.config import Config
 from llama_index.core import (
     Document,
     Settings,
     SimpleDirectoryReader,
-    StorageContext,
     VectorStoreIndex,
 )
 from llama_index.core.node_parser import SimpleNodeParser
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.core.readers.file.base import default_file_metadata_func
+from llama_index.core.vector_stores import ExactMatchFilter, MetadataFilters
 from llama_index.llms.bedrock import Bedrock
 from llama_index.vector_stores.chroma import ChromaVectorStore
 
 from app.config import config
+from app.utils.answer_cache import answer_cache
+from app.utils.embedding import BatchingEmbedding, OnnxEmbedding
+from app.utils.llm_governor import BATCH, INTERACTIVE
+from app.utils.manifest import (
+    FileEntry,
+    IngestionManifest,
+    get_manifest,
+    list_data_files,
+    manifests_generation,
+)
+from app.utils.metrics import INDEX_BUILDS, INGESTED_FILES
+from app.utils.mock_llm import SimulatedLLM
+from app.utils.registry import index_registry
+from app.utils.summarize import SUMMARY_PROMPT_VERSION, summarize_text
+from app.utils.transcript import TranscriptReader
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,7 +52,12 @@ def initialize_bedrock_client():
             region_name=config.AWS_DEFAULT_REGION,
             aws_access_key_id=config.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-            config=Config(retries={"max_attempts": 10, "mode": "standard"}),
+            config=Config(
+                retries={
+                    "max_attempts": config.BEDROCK_MAX_ATTEMPTS,
+                    "mode": "standard",
+                }
+            ),
         )
         logger.info(
             "Bedrock client initialized with region: %s",
@@ -69,6 +95,8 @@ def initialize_llm(bedrock_runtime):
             client=bedrock_runtime,
             context_size=200000,
             temperature=0,
+            # Throttling is retried by the LLM governor, not by llama-index.
+            max_retries=1,
         )
         logger.info(
             "Successfully initialized Bedrock LLM with model: %s", llm.model
@@ -92,181 +120,509 @@ def initialize_llm(bedrock_runtime):
     return None
 
 
+def initialize_mock_llm():
+    llm = SimulatedLLM(
+        tokens_per_second=config.MOCK_LLM_TOKENS_PER_SECOND,
+        latency_ms=config.MOCK_LLM_LATENCY_MS,
+        max_tokens=config.MOCK_LLM_MAX_TOKENS,
+        throttle_concurrency=config.MOCK_LLM_THROTTLE_CONCURRENCY,
+    )
+    logger.info(
+        "Using simulated LLM (%.0f tokens/s, %.0fms latency)",
+        llm.tokens_per_second,
+        llm.latency_ms,
+    )
+    return llm
+
+
+def initialize_embed_model():
+    if config.EMBEDDING_BACKEND == "onnx":
+        embed_model = OnnxEmbedding(
+            model_name=config.EMBEDDING_MODEL,
+            model_dir=config.EMBEDDING_ONNX_DIR,
+            quantized=config.EMBEDDING_ONNX_QUANTIZE,
+            num_threads=config.EMBEDDING_ONNX_THREADS,
+            query_instruction=config.EMBEDDING_QUERY_INSTRUCTION,
+        )
+    else:
+        # Imported lazily so the ONNX backend never loads torch.
+        from llama_index.embeddings.huggingface import (  # pylint: disable=import-outside-toplevel
+            HuggingFaceEmbedding,
+        )
+
+        embed_model = HuggingFaceEmbedding(model_name=config.EMBEDDING_MODEL)
+    if config.EMBEDDING_BATCHING:
+        embed_model = BatchingEmbedding(
+            embed_model,
+            max_batch_size=config.EMBEDDING_MAX_BATCH_SIZE,
+            max_wait_ms=config.EMBEDDING_MAX_WAIT_MS,
+        )
+    return embed_model
+
+
+# The models are created on first use rather than at import. Until then
+# Settings would fall back to llama-index's default (OpenAI) models, so every
+# path that needs them goes through initialize_settings() first.
+_embed_model_lock = threading.Lock()
+_llm_lock = threading.Lock()
+_embed_model_ready = False
+_llm_ready = False
+
+
+def ensure_embed_model():
+    global _embed_model_ready  # pylint: disable=global-statement
+    if not _embed_model_ready:
+        with _embed_model_lock:
+            if not _embed_model_ready:
+                Settings.embed_model = initialize_embed_model()
+                _embed_model_ready = True
+
+
+def ensure_llm():
+    global _llm_ready  # pylint: disable=global-statement
+    if not _llm_ready:
+        with _llm_lock:
+            if not _llm_ready:
+                if config.LLM_PROVIDER == "mock":
+                    llm = initialize_mock_llm()
+                else:
+                    llm = initialize_llm(initialize_bedrock_client())
+                if llm is None:
+                    # Settings.llm = None would install llama-index's MockLLM;
+                    # stay not ready so the next caller tries again.
+                    raise RuntimeError("Could not initialize the Bedrock LLM")
+                Settings.llm = llm
+                _llm_ready = True
+
+
 def initialize_settings():
-    embed_model = HuggingFaceEmbedding(model_name=config.EMBEDDING_MODEL)
-    Settings.embed_model = embed_model
-    Settings.llm = initialize_llm(initialize_bedrock_client())
+    ensure_embed_model()
+    ensure_llm()
 
-    # os.environ["OPENAI_API_KEY"] = "sk-proj-H1GNnjxf1oq2JzHc1r6gT3BlbkFJX6yPVR204SYTFRJCkjNT"
-    # llm = OpenAI(model="gpt-4-1106-preview", temperature=0)
-    # Settings.llm = llm
 
+GLOBAL_COLLECTION_NAME = "global_patient_data"
 
-initialize_settings()
+# Transcript exports are split into time windows instead of being embedded as
+# raw JSON.
+FILE_EXTRACTOR = {".json": TranscriptReader()}
 
+# Parses and embeds changed files and summarizes changed patients in parallel.
+_build_pool = ThreadPoolExecutor(
+    max_workers=config.INDEX_BUILD_WORKERS, thread_name_prefix="index-build"
+)
 
-def get_patient_index(patient_name: str) -> Tuple[VectorStoreIndex, str]:
-    patient_dir = os.path.join(config.PATIENT_DATA_DIR, patient_name)
-    if not os.path.isdir(patient_dir):
-        raise FileNotFoundError(f"Patient directory not found: {patient_name}")
 
-    collection_name = f"{patient_name}_collection"
-    db = chromadb.PersistentClient(path=config.STORAGE_DIR)
-    chroma_collection = db.get_or_create_collection(collection_name)
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+# Meetings live in their patient's collection; their nodes are told apart by
+# this metadata key, which holds the file name without its extension.
+MEETING_KEY = "meeting"
 
-    if len(chroma_collection.get()["documents"]) == 0:
-        documents = SimpleDirectoryReader(
-            input_dir=patient_dir, recursive=True
-        ).load_data()
-        nodes = SimpleNodeParser.from_defaults().get_nodes_from_documents(documents)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        index = VectorStoreIndex(nodes=nodes, storage_context=storage_context)
-    else:
-        index = VectorStoreIndex.from_vector_store(vector_store)
 
-    return index, collection_name
+def meeting_of(file_path: str) -> str:
+    return os.path.splitext(os.path.basename(file_path))[0]
 
 
-def get_global_index() -> VectorStoreIndex:
-    logger.info("Starting get_global_index")
-    collection_name = "global_patient_data"
-    db = chromadb.PersistentClient(path=config.STORAGE_DIR)
-    chroma_collection = db.get_or_create_collection(collection_name)
+def patient_metadata(file_path: str) -> Dict[str, str]:
+    metadata = default_file_metadata_func(file_path)
+    relative_path = os.path.relpath(file_path, config.PATIENT_DATA_DIR)
+    metadata["patient"] = relative_path.split(os.sep)[0]
+    metadata[MEETING_KEY] = meeting_of(file_path)
+    return metadata
+
+
+def _open_index(collection_name: str) -> VectorStoreIndex:
+    initialize_settings()
+    chroma_collection = index_registry.get_collection(collection_name)
     vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    INDEX_BUILDS.inc()
+    return VectorStoreIndex.from_vector_store(vector_store)
 
-    try:
-        if len(chroma_collection.get()["documents"]) == 0:
-            logger.info("Creating new global index")
-            all_documents = []
-            for patient in os.listdir(config.PATIENT_DATA_DIR):
-                patient_dir = os.path.join(config.PATIENT_DATA_DIR, patient)
-                if os.path.isdir(patient_dir):
-                    logger.info(
-                        "Processing patient directory: %s", patient
-                    )  # Use lazy % formatting
-                    patient_documents = SimpleDirectoryReader(
-                        input_dir=patient_dir, recursive=True
-                    ).load_data()
-                    logger.info(
-                        "Loaded %d documents for patient %s",
-                        len(patient_documents),
-                        patient,  # Use lazy % formatting
-                    )
-                    patient_summary = summarize_patient_data_view(patient_documents)
-                    logger.info(
-                        "Created summary for patient %s", patient
-                    )  # Use lazy % formatting
-                    all_documents.extend(patient_documents + [patient_summary])
-
-            logger.info(
-                "Total documents loaded: %d", len(all_documents)
-            )  # Use lazy % formatting
-            logger.info("Creating nodes from documents")
-            nodes = SimpleNodeParser.from_defaults().get_nodes_from_documents(
-                all_documents
+
+def open_index(collection_name: str) -> VectorStoreIndex:
+    return index_registry.get_index(
+        collection_name, lambda: _open_index(collection_name)
+    )
+
+
+def _purge_unmanifested(chroma_collection, manifest: IngestionManifest) -> None:
+    # Collections built before the manifest existed carry no record of which
+    # file produced which node, so they are emptied once and re-ingested.
+    if manifest.is_empty() and chroma_collection.count() > 0:
+        logger.warning(
+            "Collection %s has no manifest, re-ingesting from scratch",
+            manifest.collection_name,
+        )
+        ids = chroma_collection.get(include=[])["ids"]
+        chroma_collection.delete(ids=ids)
+
+
+def _delete_nodes(chroma_collection, node_ids: List[str]) -> None:
+    if node_ids:
+        chroma_collection.delete(ids=node_ids)
+
+
+def _insert_documents(index: VectorStoreIndex, documents: List[Document]) -> List[str]:
+    nodes = SimpleNodeParser.from_defaults().get_nodes_from_documents(documents)
+    if nodes:
+        index.insert_nodes(nodes)
+    return [node.node_id for node in nodes]
+
+
+def _ingest_file(index: VectorStoreIndex, path: str) -> List[str]:
+    documents = SimpleDirectoryReader(
+        input_files=[path],
+        file_metadata=patient_metadata,
+        file_extractor=FILE_EXTRACTOR,
+    ).load_data()
+    for document in documents:
+        # Only used for filtering; the file path is already in the content.
+        document.excluded_embed_metadata_keys.append(MEETING_KEY)
+        document.excluded_llm_metadata_keys.append(MEETING_KEY)
+    node_ids = _insert_documents(index, documents)
+    INGESTED_FILES.inc()
+    return node_ids
+
+
+def _collect(futures: Dict[Future, str], record) -> None:
+    """Record every finished build, then re-raise the first failure."""
+    errors = []
+    for future in as_completed(futures):
+        try:
+            record(futures[future], future.result())
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("Failed to index %s: %s", futures[future], str(e))
+            errors.append(e)
+    if errors:
+        raise errors[0]
+
+
+def sync_collection(
+    collection_name: str,
+    files: List[str],
+    known_hashes: Optional[Dict[str, str]] = None,
+) -> bool:
+    """
+    Bring ``collection_name`` in line with ``files``: embed files that were
+    added or edited since the last sync and drop the nodes of files that were
+    edited or removed. Changed files are parsed and embedded in parallel.
+    Returns whether anything changed.
+    """
+    with index_registry.key_lock(collection_name):
+        manifest = get_manifest(collection_name)
+        chroma_collection = index_registry.get_collection(collection_name)
+        _purge_unmanifested(chroma_collection, manifest)
+
+        diff = manifest.diff(files, known_hashes=known_hashes)
+        if not diff:
+            return False
+
+        index = open_index(collection_name)
+
+        def record(path: str, node_ids: List[str]) -> None:
+            entry = diff.changed[path]
+            entry.node_ids = node_ids
+            manifest.files[path] = entry
+
+        try:
+            for path, entry in diff.removed.items():
+                _delete_nodes(chroma_collection, entry.node_ids)
+                del manifest.files[path]
+
+            for path in diff.changed:
+                previous = manifest.files.pop(path, None)
+                if previous is not None:
+                    _delete_nodes(chroma_collection, previous.node_ids)
+            _collect(
+                {
+                    _build_pool.submit(_ingest_file, index, path): path
+                    for path in diff.changed
+                },
+                record,
             )
-            storage_context = StorageContext.from_defaults(vector_store=vector_store)
+        finally:
+            manifest.save()
+            answer_cache.invalidate(collection_name)
 
-            index = VectorStoreIndex(nodes=nodes, storage_context=storage_context)
-            logger.info("New global index created successfully")
-        else:
-            logger.info("Loading existing global index")
-            index = VectorStoreIndex.from_vector_store(vector_store)
-            logger.info("Existing global index loaded successfully")
+        logger.info(
+            "Synced collection %s: %d added or changed, %d removed",
+            collection_name,
+            len(diff.changed),
+            len(diff.removed),
+        )
+        return True
 
-        return index
-    except Exception as e:
-        logger.error("Error in get_global_index: %s", str(e))  # Use lazy % formatting
-        raise
 
+def collection_is_empty(collection_name: str) -> bool:
+    return get_manifest(collection_name).is_empty()
 
-def create_meeting_index(patient_name: str, meeting_name: str) -> VectorStoreIndex:
-    file_path = os.path.join(
-        config.PATIENT_DATA_DIR, patient_name, f"{meeting_name}.txt"
-    )
 
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Meeting file not found: {file_path}")
+def data_version(collection_name: str) -> str:
+    return get_manifest(collection_name).version
 
-    # Sanitize the collection name
-    sanitized_meeting_name = meeting_name.replace(" ", "_").lower()
-    collection_name = f"{patient_name.lower()}_{sanitized_meeting_name}"[
-        :63
-    ]  # Limit to 63 characters
 
-    db = chromadb.PersistentClient(path=config.STORAGE_DIR)
-    chroma_collection = db.get_or_create_collection(collection_name)
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+def patient_collection_name(patient_name: str) -> str:
+    return f"{patient_name}_collection"
 
-    if len(chroma_collection.get()["documents"]) == 0:
-        documents = SimpleDirectoryReader(input_files=[file_path]).load_data()
-        nodes = SimpleNodeParser.from_defaults().get_nodes_from_documents(documents)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        index = VectorStoreIndex(nodes=nodes, storage_context=storage_context)
-    else:
-        index = VectorStoreIndex.from_vector_store(vector_store)
 
-    return index
+def sync_patient_collection(
+    patient_name: str, known_hashes: Optional[Dict[str, str]] = None
+) -> bool:
+    patient_dir = os.path.join(config.PATIENT_DATA_DIR, patient_name)
+    if not os.path.isdir(patient_dir):
+        raise FileNotFoundError(f"Patient directory not found: {patient_name}")
+    return sync_collection(
+        patient_collection_name(patient_name),
+        list_data_files(patient_dir),
+        known_hashes=known_hashes,
+    )
 
 
-def summarize_patient_data(documents: List[Document]) -> Document:
-    summary_template = """You are an AI Psychologist with a specialty of diagnosing Autism in children.
-    The following is a transcription of a conversation between our Staff and one or more parent/guardian of a child with Autism, and may even include a translator - You will need to determine the speakers.
-    Your job is to review the transcription and provide an extremely detailed summary of the conversation that includes as much a detail as possible.
+def get_patient_index(patient_name: str) -> Tuple[VectorStoreIndex, str]:
+    patient_dir = os.path.join(config.PATIENT_DATA_DIR, patient_name)
+    if not os.path.isdir(patient_dir):
+        raise FileNotFoundError(f"Patient directory not found: {patient_name}")
 
+    collection_name = patient_collection_name(patient_name)
+    # Later changes are picked up by ingestion jobs; only a collection that
+    # has never been built is ingested on the request path.
+    if collection_is_empty(collection_name):
+        sync_patient_collection(patient_name)
+    return open_index(collection_name), collection_name
 
-    {text}
 
-    Summary:"""
+def list_patients() -> List[str]:
+    return [
+        patient
+        for patient in sorted(os.listdir(config.PATIENT_DATA_DIR))
+        if os.path.isdir(os.path.join(config.PATIENT_DATA_DIR, patient))
+    ]
 
-    chunk_size = 4000  # Adjust this value based on the model's input limit
-    summaries = []
 
-    for i in range(0, len(documents), 3):  # Process 3 documents at a time
-        chunk_docs = documents[i : i + 3]
-        text_content = "\n".join([doc.text for doc in chunk_docs])
+def _list_patient_files() -> Dict[str, List[str]]:
+    return {
+        patient: list_data_files(os.path.join(config.PATIENT_DATA_DIR, patient))
+        for patient in list_patients()
+    }
 
-        if len(text_content) > chunk_size:
-            # Split the text content into smaller chunks
-            chunks = [
-                text_content[j : j + chunk_size]
-                for j in range(0, len(text_content), chunk_size)
-            ]
-            chunk_summaries = []
 
-            for chunk in chunks:
-                chunk_summary = Settings.llm.complete(
-                    summary_template.format(text=chunk)
-                )
-                chunk_summaries.append(chunk_summary.text)
+def _summary_cache_path(patient: str) -> str:
+    return os.path.join(config.STORAGE_DIR, "patient_summaries", f"{patient}.json")
+
 
-            summaries.append("\n".join(chunk_summaries))
+def _cached_summary(patient: str, key: str) -> Optional[str]:
+    try:
+        with open(_summary_cache_path(patient), "r", encoding="utf-8") as file:
+            cached = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return cached["text"] if cached.get("key") == key else None
+
+
+def _store_summary(patient: str, key: str, text: str) -> None:
+    path = _summary_cache_path(patient)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump({"key": key, "text": text}, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def _refresh_summary(
+    index: VectorStoreIndex, patient: str, files: List[str], key: str
+) -> List[str]:
+    summary_text = _cached_summary(patient, key)
+    if summary_text is None:
+        logger.info("Processing patient directory: %s", patient)
+        patient_documents = SimpleDirectoryReader(
+            input_files=files, file_extractor=FILE_EXTRACTOR
+        ).load_data()
+        logger.info(
+            "Loaded %d documents for patient %s", len(patient_documents), patient
+        )
+        summary_text = summarize_patient_data_view(patient_documents).text
+        _store_summary(patient, key, summary_text)
+        logger.info("Created summary for patient %s", patient)
+    else:
+        logger.info("Reusing cached summary for patient %s", patient)
+    summary = Document(
+        text=summary_text, extra_info={"type": "patient_summary", "patient": patient}
+    )
+    return _insert_documents(index, [summary])
+
+
+def _sync_patient_summaries(patients: Dict[str, List[str]]) -> bool:
+    manifest = get_manifest(GLOBAL_COLLECTION_NAME)
+    chroma_collection = index_registry.get_collection(GLOBAL_COLLECTION_NAME)
+    index = open_index(GLOBAL_COLLECTION_NAME)
+
+    stale = {}
+    for patient in list(manifest.summaries):
+        if not patients.get(patient):
+            _delete_nodes(chroma_collection, manifest.summaries.pop(patient).node_ids)
+            stale[patient] = None
+    for patient, files in patients.items():
+        if not files:
+            continue
+        # Keyed on the patient's file hashes and the summarization prompt, so
+        # only patients whose data changed are summarized again.
+        key = f"{manifest.digest_for(files)}:{SUMMARY_PROMPT_VERSION}"
+        previous = manifest.summaries.get(patient)
+        if previous is None or previous.hash != key:
+            stale[patient] = key
+
+    def record(patient: str, node_ids: List[str]) -> None:
+        previous = manifest.summaries.get(patient)
+        if previous is not None:
+            _delete_nodes(chroma_collection, previous.node_ids)
+        manifest.summaries[patient] = FileEntry(
+            hash=stale[patient], mtime=time.time(), size=0, node_ids=node_ids
+        )
+
+    try:
+        _collect(
+            {
+                _build_pool.submit(
+                    _refresh_summary, index, patient, patients[patient], key
+                ): patient
+                for patient, key in stale.items()
+                if key is not None
+            },
+            record,
+        )
+    finally:
+        manifest.save()
+    return bool(stale)
+
+
+def sync_global_collection(known_hashes: Optional[Dict[str, str]] = None) -> bool:
+    patients = _list_patient_files()
+    with index_registry.key_lock(GLOBAL_COLLECTION_NAME):
+        if config.GLOBAL_RETRIEVAL == "federated":
+            # Chunks live only in the patient collections. Syncing the global
+            # collection with no files drops chunks left over from the
+            # duplicated layout, leaving just the patient summaries.
+            changed = sync_collection(GLOBAL_COLLECTION_NAME, [])
+            for patient in patients:
+                changed |= sync_patient_collection(patient, known_hashes=known_hashes)
         else:
-            summary = Settings.llm.complete(summary_template.format(text=text_content))
-            summaries.append(summary.text)
+            all_files = [path for files in patients.values() for path in files]
+            changed = sync_collection(
+                GLOBAL_COLLECTION_NAME, all_files, known_hashes=known_hashes
+            )
+        changed |= _sync_patient_summaries(patients)
+    if changed:
+        answer_cache.invalidate(GLOBAL_COLLECTION_NAME)
+    return changed
+
+
+@dataclass
+class _Federation:
+    generation: int
+    version: str
+    indexes: Dict[str, VectorStoreIndex]
+
+
+_federation_lock = threading.Lock()
+_federation: Optional[_Federation] = None
+
+
+def _federation_state() -> _Federation:
+    """
+    The global data version and the indexes searched by federated
+    retrieval, rebuilt only after a manifest changed (patients join the
+    federation by being ingested). The indexes are held here rather than in
+    the index registry, so questions over every patient don't cycle its LRU;
+    unchanged collections keep their index across rebuilds.
+    """
+    global _federation  # pylint: disable=global-statement
+    generation = manifests_generation()
+    federation = _federation
+    if federation is not None and federation.generation == generation:
+        return federation
+    with _federation_lock:
+        federation = _federation
+        if federation is not None and federation.generation == generation:
+            return federation
+        previous = federation.indexes if federation is not None else {}
+        indexes = {GLOBAL_COLLECTION_NAME: get_global_index()}
+        versions = [data_version(GLOBAL_COLLECTION_NAME)]
+        for patient in list_patients():
+            collection_name = patient_collection_name(patient)
+            versions.append(data_version(collection_name))
+            if not collection_is_empty(collection_name):
+                indexes[collection_name] = previous.get(collection_name) or _open_index(
+                    collection_name
+                )
+        _federation = _Federation(
+            generation=generation,
+            version=hashlib.sha256("\n".join(versions).encode("utf-8")).hexdigest(),
+            indexes=indexes,
+        )
+        return _federation
 
-    # Combine all summaries
-    final_summary = "\n\n".join(summaries)
 
-    # If the final summary is still too long, summarize it again
-    if len(final_summary) > chunk_size:
-        final_summary = Settings.llm.complete(
-            summary_template.format(text=final_summary)
-        ).text
+def global_data_version() -> str:
+    if config.GLOBAL_RETRIEVAL != "federated":
+        return data_version(GLOBAL_COLLECTION_NAME)
+    return _federation_state().version
 
-    return Document(text=final_summary, extra_info={"type": "patient_summary"})
 
+def get_global_index() -> VectorStoreIndex:
+    logger.info("Starting get_global_index")
+    try:
+        manifest = get_manifest(GLOBAL_COLLECTION_NAME)
+        # A global collection still holding duplicated chunks is migrated to
+        # the federated layout on first use.
+        if manifest.is_empty() or (
+            config.GLOBAL_RETRIEVAL == "federated" and manifest.files
+        ):
+            logger.info("Creating new global index")
+            sync_global_collection()
+        return open_index(GLOBAL_COLLECTION_NAME)
+    except Exception as e:
+        logger.error("Error in get_global_index: %s", str(e))  # Use lazy % formatting
+        raise
 
-def summarize_patient_data_view(documents: List[Document]) -> Document:
-    summary_template = """You are an AI Psychologist with a specialty of diagnosing Autism in children.
-The following is a transcription of a conversation between our Staff and one or more parent/guardian of a child with Autism, and may even include a translator - You will need to determine the speakers.
-Your job is to review the transcription and provide an extremely detailed summary of the conversation that includes as much a detail as possible.
 
-{text}
+def get_global_indexes() -> List[VectorStoreIndex]:
+    """The summaries index followed by every built patient collection."""
+    return list(_federation_state().indexes.values())
+
 
-Summary:"""
+MEETING_EXTENSIONS = (".txt", ".json")
 
+
+def _meeting_file_path(patient_name: str, meeting_name: str) -> str:
+    for extension in MEETING_EXTENSIONS:
+        file_path = os.path.join(
+            config.PATIENT_DATA_DIR, patient_name, f"{meeting_name}{extension}"
+        )
+        if os.path.exists(file_path):
+            return file_path
+    raise FileNotFoundError(f"Meeting file not found: {file_path}")
+
+
+def get_meeting_index(
+    patient_name: str, meeting_name: str
+) -> Tuple[VectorStoreIndex, str]:
+    """The patient's index; restrict retrieval with ``meeting_filters``."""
+    _meeting_file_path(patient_name, meeting_name)
+    return get_patient_index(patient_name)
+
+
+def meeting_filters(meeting_name: str) -> MetadataFilters:
+    return MetadataFilters(
+        filters=[ExactMatchFilter(key=MEETING_KEY, value=meeting_name)]
+    )
+
+
+async def asummarize_patient_data(
+    documents: List[Document], priority: str = INTERACTIVE
+) -> Document:
     text_content = "\n".join([doc.text for doc in documents])
-    summary = Settings.llm.complete(summary_template.format(text=text_content))
-    return Document(text=summary.text, extra_info={"type": "patient_summary"})
+    await asyncio.to_thread(ensure_llm)
+    result = await summarize_text(text_content, priority=priority)
+    return Document(text=result.text, extra_info={"type": "patient_summary"})
+
+
+def summarize_patient_data_view(documents: List[Document]) -> Document:
+    # Only ingestion summarizes synchronously; it yields to interactive calls.
+    return asyncio.run(asummarize_patient_data(documents, priority=BATCH))
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class IndexManager(BaseManager):
+    """Connects web workers to the index-owner process (see ``index_server``)."""
+
+
+IndexManager.register("service")
+
+
+def parse_address(address: str) -> Union[Tuple[str, int], str]:
+    """``host:port`` for TCP, anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+class IndexClient:
+    """
+    Proxy to the index owner's ``IndexService``. Connects on first use,
+    retrying until ``connect_timeout`` while the owner is still starting.
+    Multiprocessing proxies open one connection per thread, so the client can
+    be used from any worker thread.
+    """
+
+    def __init__(self, address: str, authkey: str, connect_timeout: float):
+        self.address = address
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self._lock = threading.Lock()
+        self._service = None
+
+    def connect(self):
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = self._connect()
+        return self._service
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            manager = IndexManager(
+                address=parse_address(self.address),
+                authkey=self.authkey.encode("utf-8"),
+            )
+            try:
+                manager.connect()
+                break
+            except (ConnectionRefusedError, FileNotFoundError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+        logger.info("Connected to index server at %s", self.address)
+        # pylint: disable=no-member
+        return manager.service()
+
+    def open_collection(self, kind: str, *args: str) -> str:
+        """Sync (if never built) and open a collection; returns its name."""
+        return self.connect().open_collection(kind, *args)
+
+    def data_version(self, collection_name: str) -> str:
+        return self.connect().data_version(collection_name)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.connect().embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.connect().embed_queries(texts)
+
+    def retrieve(
+        self,
+        scope: Tuple[str, ...],
+        query_str: str,
+        embedding: Optional[List[float]],
+        similarity_top_k: int,
+    ):
+        return self.connect().retrieve(scope, query_str, embedding, similarity_top_k)
+
+    def indexed_files(self, patient_name: str) -> Dict[str, Tuple[float, int]]:
+        return self.connect().indexed_files(patient_name)
+
+    def submit_ingestion(self, patient_name: str, known_hashes: Dict[str, str]) -> dict:
+        return self.connect().submit_ingestion(patient_name, known_hashes)
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        return self.connect().get_job(job_id)
+
+    def catalog_page(
+        self, cursor: Optional[str], limit: Optional[int], prefix: str
+    ) -> Tuple[List[Tuple[str, list]], Optional[str]]:
+        return self.connect().catalog_page(cursor, limit, prefix)
+
+    def metrics(self) -> Dict[str, List[str]]:
+        """The owner's metric samples, by metric name."""
+        return self.connect().metrics()
+
+
+class RemoteJob:
+    """An ingestion job running in the index owner, as seen by a worker."""
+
+    def __init__(self, state: dict):
+        self.state = state
+
+    @property
+    def id(self) -> str:
+        return self.state["job_id"]
+
+    def to_dict(self) -> dict:
+        return self.state
+
+
+class RemoteIngestionQueue:
+    """``IngestionQueue`` interface forwarding to the index owner's queue."""
+
+    def __init__(self, client: IndexClient):
+        self.client = client
+
+    def submit(
+        self, patient_name: str, known_hashes: Optional[Dict[str, str]] = None
+    ) -> RemoteJob:
+        return RemoteJob(self.client.submit_ingestion(patient_name, known_hashes or {}))
+
+    def get(self, job_id: str) -> Optional[RemoteJob]:
+        state = self.client.get_job(job_id)
+        return RemoteJob(state) if state is not None else None
+
+    def shutdown(self) -> None:
+        pass
+
+
+# Set in web workers of a multi-worker deployment; None when this process
+# owns the indexes itself.
+index_client = (
+    IndexClient(
+        config.INDEX_SERVER_ADDRESS,
+        config.INDEX_SERVER_AUTHKEY,
+        config.INDEX_SERVER_CONNECT_TIMEOUT,
+    )
+    if config.INDEX_SERVER_ADDRESS
+    else None
+)
@@ -0,0 +1,226 @@
+"""
+Index-owner process for multi-worker deployments.
+
+Chroma's persistent client must not be shared between processes, and every
+worker would otherwise load its own embedding model. In this mode a single
+process owns both and runs ingestion, and the uvicorn workers call it over a
+local multiprocessing-manager connection for embedding, retrieval and
+ingestion jobs. ``python main.py`` starts it when WEB_WORKERS > 1; it can
+also be run on its own:
+
+    INDEX_SERVER_AUTHKEY=... python -m app.utils.index_server --address 127.0.0.1:8799
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from llama_index.core import QueryBundle, Settings
+from llama_index.core.schema import NodeWithScore
+
+from app.config import config
+from app.utils.catalog import CatalogFile, patient_catalog
+from app.utils.embedding import embed_queries
+from app.utils.index import (
+    GLOBAL_COLLECTION_NAME,
+    data_version,
+    ensure_embed_model,
+    get_global_index,
+    get_global_indexes,
+    get_meeting_index,
+    get_patient_index,
+    global_data_version,
+    meeting_filters,
+    open_index,
+    patient_collection_name,
+)
+from app.utils.index_client import IndexManager, parse_address
+from app.utils.jobs import ingestion_queue
+from app.utils.manifest import get_manifest
+from app.utils.metrics import registry
+from app.utils.retrieval import FederatedRetriever
+from app.utils.warmup import warm_up, warmup_state
+
+logger = logging.getLogger(__name__)
+
+
+class IndexService:
+    """
+    What the index owner exposes to the web workers. Each worker connection
+    is served on its own thread, so every method must be thread-safe; the
+    index registry and the ingestion queue already are.
+    """
+
+    def open_collection(self, kind: str, *args: str) -> str:
+        if kind == "patient":
+            return get_patient_index(*args)[1]
+        if kind == "meeting":
+            return get_meeting_index(*args)[1]
+        if kind == "global":
+            get_global_index()
+            return GLOBAL_COLLECTION_NAME
+        raise ValueError(f"Unknown collection kind: {kind}")
+
+    def data_version(self, collection_name: str) -> str:
+        if collection_name == GLOBAL_COLLECTION_NAME:
+            return global_data_version()
+        return data_version(collection_name)
+
+    def embed_query(self, text: str) -> List[float]:
+        ensure_embed_model()
+        return Settings.embed_model.get_query_embedding(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        ensure_embed_model()
+        return embed_queries(Settings.embed_model, texts)
+
+    def retrieve(
+        self,
+        scope: Tuple[str, ...],
+        query_str: str,
+        embedding: Optional[List[float]],
+        similarity_top_k: int,
+    ) -> List[NodeWithScore]:
+        kind, *args = scope
+        if kind == "patient":
+            retriever = open_index(patient_collection_name(args[0])).as_retriever(
+                similarity_top_k=similarity_top_k
+            )
+        elif kind == "meeting":
+            retriever = open_index(patient_collection_name(args[0])).as_retriever(
+                similarity_top_k=similarity_top_k, filters=meeting_filters(args[1])
+            )
+        elif kind == "global" and config.GLOBAL_RETRIEVAL == "federated":
+            retriever = FederatedRetriever(
+                get_global_indexes(), similarity_top_k=similarity_top_k
+            )
+        elif kind == "global":
+            retriever = get_global_index().as_retriever(
+                similarity_top_k=similarity_top_k
+            )
+        else:
+            raise ValueError(f"Unknown retrieval scope: {scope}")
+        return retriever.retrieve(QueryBundle(query_str=query_str, embedding=embedding))
+
+    def indexed_files(self, patient_name: str) -> Dict[str, Tuple[float, int]]:
+        manifest = get_manifest(patient_collection_name(patient_name))
+        return {
+            path: (entry.mtime, entry.size) for path, entry in manifest.files.items()
+        }
+
+    def submit_ingestion(self, patient_name: str, known_hashes: Dict[str, str]) -> dict:
+        return ingestion_queue.submit(patient_name, known_hashes=known_hashes).to_dict()
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        job = ingestion_queue.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def catalog_page(
+        self, cursor: Optional[str], limit: Optional[int], prefix: str
+    ) -> Tuple[List[Tuple[str, List[CatalogFile]]], Optional[str]]:
+        return patient_catalog.page(cursor=cursor, limit=limit, prefix=prefix)
+
+    def metrics(self) -> Dict[str, List[str]]:
+        return registry.samples()
+
+
+def serve(address: str, authkey: str) -> None:
+    """Warm up, then serve the index to the workers until interrupted."""
+    registry.const_labels["worker"] = "index-owner"
+    warm_up()
+    if not warmup_state.ready:
+        raise RuntimeError(f"Index server warm-up failed: {warmup_state.error}")
+    if config.CATALOG_WATCH_ENABLED:
+        # The workers don't watch patient_data; changes are ingested from here.
+        threading.Thread(
+            target=asyncio.run,
+            args=(patient_catalog.watch(asyncio.Event()),),
+            name="catalog-watch",
+            daemon=True,
+        ).start()
+    service = IndexService()
+    IndexManager.register("service", callable=lambda: service)
+    manager = IndexManager(
+        address=parse_address(address), authkey=authkey.encode("utf-8")
+    )
+    server = manager.get_server()
+    logger.info("Index server listening on %s", address)
+    try:
+        server.serve_forever()
+    finally:
+        ingestion_queue.shutdown()
+
+
+def _wait_until_serving(server: subprocess.Popen, address: str, authkey: str) -> None:
+    """
+    Block until the owner started as ``server`` accepts connections, failing
+    as soon as it exits or after INDEX_SERVER_CONNECT_TIMEOUT.
+    """
+    deadline = time.monotonic() + config.INDEX_SERVER_CONNECT_TIMEOUT
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError(
+                f"Index server exited with code {server.returncode} during startup"
+            )
+        manager = IndexManager(
+            address=parse_address(address), authkey=authkey.encode("utf-8")
+        )
+        try:
+            manager.connect()
+            return
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+@contextlib.contextmanager
+def run_index_server() -> Iterator[None]:
+    """
+    Start an index owner for the workers about to be spawned, unless
+    INDEX_SERVER_ADDRESS already points at one, wait until it is serving and
+    export its address and key to their environment.
+    """
+    if config.INDEX_SERVER_ADDRESS:
+        yield
+        return
+    address = config.INDEX_SERVER_LISTEN
+    authkey = config.INDEX_SERVER_AUTHKEY or secrets.token_hex(16)
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "app.utils.index_server", "--address", address],
+        env={**os.environ, "INDEX_SERVER_AUTHKEY": authkey},
+    )
+    try:
+        _wait_until_serving(server, address, authkey)
+        logger.info("Index server is up at %s", address)
+        os.environ["INDEX_SERVER_ADDRESS"] = address
+        os.environ["INDEX_SERVER_AUTHKEY"] = authkey
+        yield
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--address", default=config.INDEX_SERVER_LISTEN)
+    args = parser.parse_args()
+    if config.INDEX_SERVER_ADDRESS:
+        parser.error("INDEX_SERVER_ADDRESS is for workers; unset it for the owner")
+    if not config.INDEX_SERVER_AUTHKEY:
+        parser.error("INDEX_SERVER_AUTHKEY must be set")
+    serve(args.address, config.INDEX_SERVER_AUTHKEY)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Optional
+
+from app.config import config
+from app.utils.index import (
+    sync_global_collection,
+    sync_patient_collection,
+)
+from app.utils.index_client import RemoteIngestionQueue, index_client
+
+logger = logging.getLogger(__name__)
+
+JOB_STAGES = ("patient", "global")
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:  # pylint: disable=too-many-instance-attributes
+    patient_name: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.QUEUED
+    stages: Dict[str, JobStatus] = field(
+        default_factory=lambda: {stage: JobStatus.QUEUED for stage in JOB_STAGES}
+    )
+    known_hashes: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        done = sum(status == JobStatus.COMPLETED for status in self.stages.values())
+        return done / len(self.stages)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "patient_name": self.patient_name,
+            "status": self.status.value,
+            "progress": self.progress,
+            "stages": {stage: status.value for stage, status in self.stages.items()},
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """
+    Runs patient ingestion (patient and global collections) on a worker pool
+    so uploads return immediately. A job that has not started yet absorbs
+    later uploads for the same patient instead of queueing another.
+    """
+
+    def __init__(self, max_workers: int, history_size: int):
+        self.history_size = history_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingestion"
+        )
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._pending: Dict[str, IngestionJob] = {}
+
+    def submit(
+        self, patient_name: str, known_hashes: Optional[Dict[str, str]] = None
+    ) -> IngestionJob:
+        with self._lock:
+            job = self._pending.get(patient_name)
+            if job is not None:
+                job.known_hashes.update(known_hashes or {})
+                return job
+
+            job = IngestionJob(
+                patient_name=patient_name, known_hashes=dict(known_hashes or {})
+            )
+            self._pending[patient_name] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history_size:
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run, job)
+        logger.info("Queued ingestion job %s for %s", job.id, patient_name)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: IngestionJob) -> None:
+        with self._lock:
+            self._pending.pop(job.patient_name, None)
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        stage = None
+        try:
+            for stage, step in (
+                ("patient", self._ingest_patient),
+                ("global", self._ingest_global),
+            ):
+                job.stages[stage] = JobStatus.RUNNING
+                step(job)
+                job.stages[stage] = JobStatus.COMPLETED
+            job.status = JobStatus.COMPLETED
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("Ingestion job %s failed: %s", job.id, str(e))
+            if stage is not None:
+                job.stages[stage] = JobStatus.FAILED
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            logger.info(
+                "Ingestion job %s finished with status %s in %.2fs",
+                job.id,
+                job.status.value,
+                job.finished_at - job.started_at,
+            )
+
+    @staticmethod
+    def _ingest_patient(job: IngestionJob) -> None:
+        sync_patient_collection(job.patient_name, known_hashes=job.known_hashes)
+
+    @staticmethod
+    def _ingest_global(job: IngestionJob) -> None:
+        sync_global_collection(known_hashes=job.known_hashes)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Workers of a multi-worker deployment hand ingestion to the index owner.
+ingestion_queue = (
+    RemoteIngestionQueue(index_client)
+    if index_client is not None
+    else IngestionQueue(
+        max_workers=config.INGESTION_WORKERS, history_size=config.JOB_HISTORY_SIZE
+    )
+)
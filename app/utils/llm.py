@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable, Optional
+
+from llama_index.core import Settings
+from llama_index.core.prompts import BasePromptTemplate
+from llama_index.core.utils import get_tokenizer
+
+from app.config import config
+from app.utils.llm_governor import (
+    FAILED,
+    INTERACTIVE,
+    SUCCESS,
+    THROTTLED,
+    LLMSlot,
+    is_throttling_error,
+    llm_governor,
+)
+from app.utils.metrics import LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Streams only run here while holding a governor slot, so they never wait
+# for a thread, and they don't tie up the default executor used by
+# asyncio.to_thread.
+_stream_pool = ThreadPoolExecutor(
+    max_workers=config.LLM_MAX_CONCURRENCY, thread_name_prefix="llm-stream"
+)
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer()(text))
+
+
+def should_retry(error: Exception, attempt: int) -> bool:
+    return attempt < config.LLM_THROTTLE_RETRIES and is_throttling_error(error)
+
+
+def retry_delay(attempt: int) -> float:
+    # Exponential backoff with jitter, so throttled calls don't come back
+    # in lockstep.
+    return min(8.0, 0.25 * 2**attempt) * random.uniform(0.5, 1.0)
+
+
+async def _acomplete(llm, prompt: str, **kwargs):
+    try:
+        return await llm.acomplete(prompt, **kwargs)
+    except NotImplementedError:
+        # The Bedrock LLM has no async client; run the blocking call on a
+        # worker thread instead.
+        return await asyncio.to_thread(llm.complete, prompt, **kwargs)
+
+
+async def acomplete(prompt: str, priority: str = INTERACTIVE, **kwargs) -> str:
+    """
+    Complete ``prompt`` within a slot of the LLM governor, retrying throttled
+    calls after a backoff. Raises ``LLMDeadlineExceeded`` if no slot frees up
+    before the priority's deadline.
+    """
+    llm = Settings.llm
+    deadline_at = llm_governor.deadline_for(priority)
+    attempt = 0
+    while True:
+        try:
+            async with llm_governor.aslot(priority, deadline_at):
+                response = await _acomplete(llm, prompt, **kwargs)
+            break
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            if not should_retry(e, attempt):
+                raise
+            logger.warning("LLM call throttled, retry %d", attempt + 1)
+            await asyncio.sleep(retry_delay(attempt))
+            attempt += 1
+    LLM_TOKENS.inc(count_tokens(prompt), direction="in")
+    LLM_TOKENS.inc(count_tokens(response.text), direction="out")
+    return response.text
+
+
+_DONE = object()
+
+
+class TokenStream:  # pylint: disable=too-many-instance-attributes
+    """
+    Streams an LLM completion to the event loop token by token. The Bedrock
+    LLM has no async streaming, so the blocking stream runs on a thread of
+    its own pool and hands each token over as it arrives. ``cancel`` ends the
+    stream for the consumer at once and stops the upstream generation at its
+    next token, freeing the thread.
+
+    The generation holds a slot of the LLM governor: ``slot`` when the caller
+    already acquired one, otherwise one awaited at ``priority`` before a
+    thread is used. A throttled stream is retried until its first token
+    arrives.
+    """
+
+    def __init__(
+        self,
+        prompt: BasePromptTemplate,
+        started_at: Optional[float] = None,
+        on_finish: Optional[Callable[["TokenStream"], None]] = None,
+        slot: Optional[LLMSlot] = None,
+        priority: str = INTERACTIVE,
+        **prompt_args: Any,
+    ):
+        self.prompt = prompt
+        self.prompt_args = prompt_args
+        self.on_finish = on_finish
+        self.priority = slot.priority if slot is not None else priority
+        self._slot = slot
+        self._deadline_at = llm_governor.deadline_for(self.priority)
+        self.generation_started_at = time.perf_counter()
+        self.started_at = started_at or self.generation_started_at
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.tokens = 0
+        self._emitted = False
+        self._cancelled = threading.Event()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._producer = self._loop.create_task(self._produce())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def ttft(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Wait for the first token, from the start of generation only."""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.generation_started_at
+
+    @property
+    def stream_seconds(self) -> Optional[float]:
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.first_token_at
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else None
+
+    def _emit(self, item) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop has shut down; nobody is listening any more.
+            self._cancelled.set()
+
+    def _generate(self) -> None:
+        """Stream tokens to the consumer; runs on a stream pool thread."""
+        # Bedrock sends the request before returning the generator, so a
+        # throttled start raises here rather than on the first token.
+        stream = Settings.llm.stream(self.prompt, **self.prompt_args)
+        try:
+            for token in stream:
+                if self._cancelled.is_set():
+                    break
+                self._emit(token)
+                self._emitted = True
+        finally:
+            stream.close()
+
+    async def _produce(self) -> None:
+        outcome = FAILED
+        attempt = 0
+        try:
+            # The context and the question make up nearly all of the prompt;
+            # counting them spares formatting it a second time.
+            LLM_TOKENS.inc(
+                sum(count_tokens(str(arg)) for arg in self.prompt_args.values()),
+                direction="in",
+            )
+            while True:
+                if self._slot is None:
+                    self._slot = await llm_governor.aacquire(
+                        self.priority, self._deadline_at
+                    )
+                if self._cancelled.is_set():
+                    break
+                try:
+                    await self._loop.run_in_executor(_stream_pool, self._generate)
+                    break
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    if self._emitted or not should_retry(e, attempt):
+                        raise
+                logger.warning("LLM stream throttled, retry %d", attempt + 1)
+                llm_governor.release(self._slot, THROTTLED)
+                self._slot = None
+                await asyncio.sleep(retry_delay(attempt))
+                attempt += 1
+            # A cancelled stream says nothing about the provider's capacity.
+            outcome = FAILED if self._cancelled.is_set() else SUCCESS
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            if is_throttling_error(e):
+                outcome = THROTTLED
+            self._queue.put_nowait(e)
+        finally:
+            if self._slot is not None:
+                llm_governor.release(self._slot, outcome)
+            self._queue.put_nowait(_DONE)
+
+    def cancel(self) -> None:
+        if not self._cancelled.is_set():
+            self._cancelled.set()
+            self._queue.put_nowait(_DONE)
+
+    async def async_response_gen(self) -> AsyncGenerator[str, None]:
+        finished = False
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _DONE:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self.tokens += 1
+                yield item
+        finally:
+            self.finished_at = time.perf_counter()
+            if not finished:
+                # The consumer went away mid-stream; nobody will read the rest.
+                self.cancel()
+            LLM_TOKENS.inc(self.tokens, direction="out")
+            if self.on_finish is not None:
+                self.on_finish(self)
+            logger.info(
+                "Generation %s: ttft %s, %d tokens, %s tokens/s",
+                "cancelled" if self.cancelled else "finished",
+                f"{self.ttft:.3f}s" if self.ttft is not None else "n/a",
+                self.tokens,
+                (
+                    f"{self.tokens_per_second:.1f}"
+                    if self.tokens_per_second is not None
+                    else "n/a"
+                ),
+            )
@@ -0,0 +1,328 @@
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+
+import botocore.exceptions
+
+from app.config import config
+from app.utils.metrics import (
+    LLM_ACTIVE,
+    LLM_CONCURRENCY_LIMIT,
+    LLM_DEADLINE_DROPPED,
+    LLM_QUEUE_DEPTH,
+    LLM_QUEUE_WAIT_SECONDS,
+    LLM_THROTTLED,
+)
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# Served in this order whenever a slot frees up.
+PRIORITIES = (INTERACTIVE, BATCH)
+
+SUCCESS = "success"
+THROTTLED = "throttled"
+FAILED = "failed"
+
+THROTTLING_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+}
+
+
+class LLMDeadlineExceeded(Exception):
+    """An LLM call waited longer than its deadline for a concurrency slot."""
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    while error is not None:
+        if isinstance(error, botocore.exceptions.ClientError):
+            return error.response.get("Error", {}).get("Code") in THROTTLING_CODES
+        error = error.__cause__ or error.__context__
+    return False
+
+
+@dataclass
+class LLMSlot:
+    priority: str
+    granted_at: float
+    # The number of limit decreases when the slot was granted.
+    epoch: int
+    released: bool = False
+
+
+class _Waiter:
+    def __init__(
+        self, priority: str, deadline_at: Optional[float], wake: Callable[[], None]
+    ):
+        self.priority = priority
+        self.deadline_at = deadline_at
+        self.wake = wake
+        self.enqueued_at = time.monotonic()
+        self.slot: Optional[LLMSlot] = None
+        self.dropped = False
+
+
+class LLMGovernor:  # pylint: disable=too-many-instance-attributes
+    """
+    Process-wide scheduler for LLM calls. Each call takes a slot before it
+    talks to the provider; slots go to interactive calls before batch calls,
+    and batch calls never hold more than ``batch_share`` of them.
+
+    The number of slots adapts AIMD-style: every throttled call multiplies it
+    by ``decrease`` (once per burst: calls granted before the last decrease
+    don't lower it again) and every successful call adds ``increase /
+    limit``, between ``min_concurrency`` and ``max_concurrency``. Calls still
+    queued when their priority's deadline passes are dropped with
+    ``LLMDeadlineExceeded``.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        *,
+        min_concurrency: int = 1,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        batch_share: float = 0.5,
+        deadlines: Optional[Dict[str, float]] = None,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.increase = increase
+        self.decrease = decrease
+        self.batch_share = batch_share
+        self.deadlines = deadlines or {}
+        self.limit = float(self.max_concurrency)
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[_Waiter]] = {p: deque() for p in PRIORITIES}
+        self._active: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self.granted = 0
+        self.throttled = 0
+        self.dropped = 0
+        LLM_CONCURRENCY_LIMIT.set(self.limit)
+
+    def deadline_for(self, priority: str) -> Optional[float]:
+        seconds = self.deadlines.get(priority, 0)
+        return time.monotonic() + seconds if seconds > 0 else None
+
+    def _has_room(self, priority: str) -> bool:
+        slots = max(self.min_concurrency, int(self.limit))
+        if sum(self._active.values()) >= slots:
+            return False
+        if priority == BATCH:
+            return self._active[BATCH] < max(1, int(slots * self.batch_share))
+        return True
+
+    def _update_gauges(self) -> None:
+        for priority in PRIORITIES:
+            LLM_QUEUE_DEPTH.set(len(self._queues[priority]), priority=priority)
+            LLM_ACTIVE.set(self._active[priority], priority=priority)
+        LLM_CONCURRENCY_LIMIT.set(self.limit)
+
+    def _drop(self, waiter: _Waiter) -> None:
+        waiter.dropped = True
+        self.dropped += 1
+        LLM_DEADLINE_DROPPED.inc(priority=waiter.priority)
+        logger.warning(
+            "Dropped %s LLM call after %.1fs in the queue",
+            waiter.priority,
+            time.monotonic() - waiter.enqueued_at,
+        )
+
+    def _dispatch(self) -> List[_Waiter]:
+        """Grant free slots to queued calls; returns the waiters to wake."""
+        woken = []
+        now = time.monotonic()
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue:
+                waiter = queue[0]
+                if waiter.deadline_at is not None and now >= waiter.deadline_at:
+                    queue.popleft()
+                    self._drop(waiter)
+                elif self._has_room(priority):
+                    queue.popleft()
+                    waiter.slot = LLMSlot(priority, now, self._epoch)
+                    self._active[priority] += 1
+                    self.granted += 1
+                    LLM_QUEUE_WAIT_SECONDS.observe(
+                        now - waiter.enqueued_at, priority=priority
+                    )
+                else:
+                    break
+                woken.append(waiter)
+        self._update_gauges()
+        return woken
+
+    def _enqueue(
+        self, priority: str, deadline_at: Optional[float], wake: Callable[[], None]
+    ) -> _Waiter:
+        if priority not in self._queues:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        if deadline_at is None:
+            deadline_at = self.deadline_for(priority)
+        waiter = _Waiter(priority, deadline_at, wake)
+        with self._lock:
+            self._queues[priority].append(waiter)
+            woken = self._dispatch()
+        for other in woken:
+            other.wake()
+        return waiter
+
+    def _claim(self, waiter: _Waiter) -> LLMSlot:
+        with self._lock:
+            if waiter.slot is not None:
+                return waiter.slot
+            if not waiter.dropped:
+                # Timed out before the dispatcher noticed.
+                self._queues[waiter.priority].remove(waiter)
+                self._drop(waiter)
+                self._update_gauges()
+        raise LLMDeadlineExceeded(
+            f"No LLM capacity for this {waiter.priority} call before its deadline"
+        )
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter.slot is None:
+                if not waiter.dropped:
+                    self._queues[waiter.priority].remove(waiter)
+                    self._update_gauges()
+                return
+        self.release(waiter.slot, FAILED)
+
+    def acquire(
+        self, priority: str = INTERACTIVE, deadline_at: Optional[float] = None
+    ) -> LLMSlot:
+        """Block until a slot is free; ``deadline_at`` is a monotonic time."""
+        granted = threading.Event()
+        waiter = self._enqueue(priority, deadline_at, granted.set)
+        timeout = None
+        if waiter.deadline_at is not None:
+            timeout = max(0.0, waiter.deadline_at - time.monotonic())
+        granted.wait(timeout)
+        return self._claim(waiter)
+
+    async def aacquire(
+        self, priority: str = INTERACTIVE, deadline_at: Optional[float] = None
+    ) -> LLMSlot:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def resolve() -> None:
+            if not granted.done():
+                granted.set_result(None)
+
+        def wake() -> None:
+            try:
+                loop.call_soon_threadsafe(resolve)
+            except RuntimeError:
+                pass  # The event loop has shut down.
+
+        waiter = self._enqueue(priority, deadline_at, wake)
+        timeout = None
+        if waiter.deadline_at is not None:
+            timeout = max(0.0, waiter.deadline_at - time.monotonic())
+        try:
+            await asyncio.wait({granted}, timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        return self._claim(waiter)
+
+    def release(self, slot: LLMSlot, outcome: str = SUCCESS) -> None:
+        """
+        Return ``slot``, adapting the limit to ``outcome``: SUCCESS grows it,
+        THROTTLED shrinks it and FAILED leaves it as it is.
+        """
+        with self._lock:
+            if slot.released:
+                return
+            slot.released = True
+            self._active[slot.priority] -= 1
+            if outcome == THROTTLED:
+                self.throttled += 1
+                LLM_THROTTLED.inc(priority=slot.priority)
+                if slot.epoch == self._epoch:
+                    self._epoch += 1
+                    self.limit = max(
+                        float(self.min_concurrency), self.limit * self.decrease
+                    )
+                    logger.warning(
+                        "LLM throttled; concurrency limit lowered to %.2f", self.limit
+                    )
+            elif outcome == SUCCESS:
+                self.limit = min(
+                    float(self.max_concurrency),
+                    self.limit + self.increase / self.limit,
+                )
+            woken = self._dispatch()
+        for waiter in woken:
+            waiter.wake()
+
+    @contextlib.contextmanager
+    def slot(
+        self, priority: str = INTERACTIVE, deadline_at: Optional[float] = None
+    ) -> Iterator[LLMSlot]:
+        slot = self.acquire(priority, deadline_at)
+        outcome = FAILED
+        try:
+            yield slot
+            outcome = SUCCESS
+        except Exception as e:
+            if is_throttling_error(e):
+                outcome = THROTTLED
+            raise
+        finally:
+            self.release(slot, outcome)
+
+    @contextlib.asynccontextmanager
+    async def aslot(
+        self, priority: str = INTERACTIVE, deadline_at: Optional[float] = None
+    ) -> AsyncIterator[LLMSlot]:
+        slot = await self.aacquire(priority, deadline_at)
+        outcome = FAILED
+        try:
+            yield slot
+            outcome = SUCCESS
+        except Exception as e:
+            if is_throttling_error(e):
+                outcome = THROTTLED
+            raise
+        finally:
+            self.release(slot, outcome)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "min_concurrency": self.min_concurrency,
+                "max_concurrency": self.max_concurrency,
+                "active": dict(self._active),
+                "queued": {p: len(q) for p, q in self._queues.items()},
+                "granted": self.granted,
+                "throttled": self.throttled,
+                "dropped": self.dropped,
+            }
+
+
+llm_governor = LLMGovernor(
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    min_concurrency=config.LLM_MIN_CONCURRENCY,
+    increase=config.LLM_AIMD_INCREASE,
+    decrease=config.LLM_AIMD_DECREASE,
+    batch_share=config.LLM_BATCH_SHARE,
+    deadlines={
+        INTERACTIVE: config.LLM_INTERACTIVE_DEADLINE_SECONDS,
+        BATCH: config.LLM_BATCH_DEADLINE_SECONDS,
+    },
+)
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class FileEntry:
+    hash: str
+    mtime: float
+    size: int
+    node_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ManifestDiff:
+    changed: Dict[str, FileEntry]
+    removed: Dict[str, FileEntry]
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.removed)
+
+
+class IngestionManifest:
+    """
+    Persistent record of what has been embedded into a Chroma collection:
+    for every source file its content hash, mtime, size and the node IDs it
+    produced. Derived documents (e.g. patient summaries) are tracked under
+    ``summaries`` keyed by patient.
+    """
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.path = os.path.join(
+            config.STORAGE_DIR, "manifests", f"{collection_name}.json"
+        )
+        self.files: Dict[str, FileEntry] = {}
+        self.summaries: Dict[str, FileEntry] = {}
+        self._version: Optional[str] = None
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable manifest %s: %s", self.path, e)
+            return
+        self.files = {k: FileEntry(**v) for k, v in data.get("files", {}).items()}
+        self.summaries = {
+            k: FileEntry(**v) for k, v in data.get("summaries", {}).items()
+        }
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "files": {k: asdict(v) for k, v in self.files.items()},
+                    "summaries": {k: asdict(v) for k, v in self.summaries.items()},
+                },
+                file,
+            )
+        os.replace(tmp_path, self.path)
+        self._version = None
+        _bump_generation()
+
+    def is_empty(self) -> bool:
+        return not self.files and not self.summaries
+
+    @property
+    def version(self) -> str:
+        """Stamp that changes whenever the embedded content changes."""
+        if self._version is None:
+            digest = hashlib.sha256()
+            for path, entry in sorted(self.files.items()):
+                digest.update(f"{path}:{entry.hash}\n".encode("utf-8"))
+            for key, entry in sorted(self.summaries.items()):
+                digest.update(f"summary:{key}:{entry.hash}\n".encode("utf-8"))
+            self._version = digest.hexdigest()
+        return self._version
+
+    def diff(
+        self, paths: Iterable[str], known_hashes: Optional[Dict[str, str]] = None
+    ) -> ManifestDiff:
+        """
+        Compare ``paths`` on disk with the manifest. Files whose mtime and size
+        are unchanged are not re-hashed; ``known_hashes`` lets callers that
+        already hashed a file (e.g. while uploading it) skip reading it again.
+        """
+        known_hashes = known_hashes or {}
+        changed: Dict[str, FileEntry] = {}
+        seen = set()
+        for path in paths:
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = self.files.get(path)
+            if (
+                entry is not None
+                and entry.mtime == stat.st_mtime
+                and entry.size == stat.st_size
+            ):
+                continue
+            file_hash = known_hashes.get(path) or hash_file(path)
+            if entry is not None and entry.hash == file_hash:
+                # Touched but not edited: refresh the stat fields only.
+                entry.mtime, entry.size = stat.st_mtime, stat.st_size
+                continue
+            changed[path] = FileEntry(
+                hash=file_hash, mtime=stat.st_mtime, size=stat.st_size
+            )
+        removed = {p: e for p, e in self.files.items() if p not in seen}
+        return ManifestDiff(changed=changed, removed=removed)
+
+    def digest_for(self, paths: Iterable[str]) -> str:
+        digest = hashlib.sha256()
+        for path in sorted(paths):
+            entry = self.files.get(path)
+            digest.update(f"{path}:{entry.hash if entry else ''}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+
+_manifests: Dict[str, IngestionManifest] = {}
+_manifests_lock = threading.Lock()
+_generation = 0
+
+
+def _bump_generation() -> None:
+    global _generation  # pylint: disable=global-statement
+    with _manifests_lock:
+        _generation += 1
+
+
+def manifests_generation() -> int:
+    """Changes whenever any manifest is saved or dropped."""
+    return _generation
+
+
+def get_manifest(collection_name: str) -> IngestionManifest:
+    with _manifests_lock:
+        manifest = _manifests.get(collection_name)
+        if manifest is None:
+            manifest = _manifests[collection_name] = IngestionManifest(collection_name)
+        return manifest
+
+
+def drop_manifest(collection_name: str) -> None:
+    with _manifests_lock:
+        manifest = _manifests.pop(collection_name, None)
+    path = (manifest or IngestionManifest(collection_name)).path
+    if os.path.exists(path):
+        os.remove(path)
+    _bump_generation()
+
+
+def list_data_files(directory: str) -> List[str]:
+    """Files under ``directory`` that SimpleDirectoryReader would load."""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        paths.extend(
+            os.path.join(root, name)
+            for name in sorted(files)
+            if not name.startswith(".")
+        )
+    return paths
@@ -0,0 +1,318 @@
+import bisect
+import contextlib
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import config
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def samples(self, const_labels: Dict[str, str]) -> List[str]:
+        """Sample lines, with ``const_labels`` added to each."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return self.header() + self.samples({})
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self, const_labels: Dict[str, str]) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        names = self.labels + tuple(const_labels)
+        extra = tuple(const_labels.values())
+        return [
+            f"{self.name}{_format_labels(names, key + extra)} {value}"
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: a count per bucket (plus +Inf), the sum and the count.
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, const_labels: Dict[str, str]) -> List[str]:
+        with self._lock:
+            values = [
+                (key, list(counts), total[0])
+                for key, (counts, total) in self._values.items()
+            ]
+        names = self.labels + tuple(const_labels)
+        extra = tuple(const_labels.values())
+        lines: List[str] = []
+        for key, counts, total in values:
+            key = key + extra
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(names + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(names, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    A minimal in-process Prometheus registry: metrics are plain Python
+    objects updated under a per-metric lock and rendered in the text
+    exposition format on demand.
+
+    Every process keeps its own values. ``const_labels`` are added to every
+    sample, so that the processes of a multi-worker deployment report
+    separate series, and ``render`` can merge in the samples of other
+    processes (see ``samples``).
+    """
+
+    def __init__(self, const_labels: Optional[Dict[str, str]] = None):
+        self._metrics: Dict[str, _Metric] = {}
+        self.const_labels = dict(const_labels or {})
+
+    def register(self, metric: _Metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def samples(self) -> Dict[str, List[str]]:
+        """This process's sample lines by metric name, for another's render."""
+        return {
+            name: metric.samples(self.const_labels)
+            for name, metric in self._metrics.items()
+        }
+
+    def render(self, others: Sequence[Dict[str, List[str]]] = ()) -> str:
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.extend(metric.header())
+            lines.extend(metric.samples(self.const_labels))
+            for other in others:
+                lines.extend(other.get(name, ()))
+        return "\n".join(lines) + "\n"
+
+
+# In a multi-worker deployment each web worker labels its metrics with its
+# pid and the index owner with "index-owner"; sum over ``worker`` for totals.
+registry = MetricsRegistry(
+    {"worker": str(os.getpid())} if config.INDEX_SERVER_ADDRESS else None
+)
+
+REQUEST_SECONDS = registry.histogram(
+    "rag_request_seconds",
+    "Time from receiving a question to the end of its answer stream.",
+    labels=("endpoint",),
+)
+STAGE_SECONDS = registry.histogram(
+    "rag_stage_seconds",
+    "Time spent in each stage of answering a question.",
+    labels=("endpoint", "stage"),
+)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "rag_requests_in_flight",
+    "Questions being answered right now.",
+    labels=("endpoint",),
+)
+ANSWER_CACHE = registry.counter(
+    "rag_answer_cache_total",
+    "Answer cache lookups by result.",
+    labels=("endpoint", "result"),
+)
+INDEX_CACHE = registry.counter(
+    "rag_index_cache_total",
+    "Index registry lookups by result.",
+    labels=("result",),
+)
+INDEX_BUILDS = registry.counter(
+    "rag_index_builds_total",
+    "Vector indexes opened on top of a Chroma collection.",
+)
+INGESTED_FILES = registry.counter(
+    "rag_ingested_files_total",
+    "Files parsed, embedded and inserted into a collection.",
+)
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total",
+    "LLM tokens sent in prompts and received in completions.",
+    labels=("direction",),
+)
+CONTEXT_TOKENS = registry.counter(
+    "rag_context_tokens_total",
+    "Context tokens retrieved for questions and left after packing.",
+    labels=("stage",),
+)
+LLM_QUEUE_DEPTH = registry.gauge(
+    "llm_queue_depth",
+    "LLM calls waiting for a concurrency slot.",
+    labels=("priority",),
+)
+LLM_QUEUE_WAIT_SECONDS = registry.histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM calls waited for a concurrency slot.",
+    labels=("priority",),
+)
+LLM_ACTIVE = registry.gauge(
+    "llm_active_calls",
+    "LLM calls holding a concurrency slot.",
+    labels=("priority",),
+)
+LLM_CONCURRENCY_LIMIT = registry.gauge(
+    "llm_concurrency_limit",
+    "Current adaptive limit on concurrent LLM calls.",
+)
+LLM_THROTTLED = registry.counter(
+    "llm_throttled_total",
+    "LLM calls rejected by the provider for exceeding its rate limits.",
+    labels=("priority",),
+)
+LLM_DEADLINE_DROPPED = registry.counter(
+    "llm_deadline_dropped_total",
+    "Queued LLM calls dropped because their deadline passed.",
+    labels=("priority",),
+)
+
+
+class RequestTimer:
+    """
+    Times one question: its stages, its total duration and its place in the
+    in-flight gauge. ``finish`` may be called more than once; only the first
+    call counts.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started_at = time.perf_counter()
+        self._finished = False
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        with STAGE_SECONDS.time(endpoint=self.endpoint, stage=name):
+            yield
+
+    def observe_stage(self, name: str, seconds: Optional[float]) -> None:
+        if seconds is not None:
+            STAGE_SECONDS.observe(seconds, endpoint=self.endpoint, stage=name)
+
+    def finish(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        REQUESTS_IN_FLIGHT.dec(endpoint=self.endpoint)
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - self.started_at, endpoint=self.endpoint
+        )
@@ -0,0 +1,148 @@
+"""
+Fold the legacy per-meeting Chroma collections into the patient collections.
+
+Meetings used to get a collection of their own, named after the patient and
+meeting and truncated to 63 characters, holding a second copy of embeddings
+the patient collection already has. Meeting questions now filter the patient
+collection on ``meeting`` metadata instead. This tool:
+
+1. syncs every patient collection so it holds all of the patient's files,
+2. adds the ``meeting`` key in place to patient nodes embedded before it
+   existed (no re-embedding),
+3. deletes the meeting collections and their manifests.
+
+    python -m app.utils.migrate_meetings [--dry-run]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Set
+
+from app.config import config
+from app.utils.index import (
+    GLOBAL_COLLECTION_NAME,
+    MEETING_KEY,
+    list_patients,
+    meeting_of,
+    patient_collection_name,
+    sync_patient_collection,
+)
+from app.utils.manifest import drop_manifest, get_manifest
+from app.utils.registry import index_registry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def legacy_meeting_collection_name(patient_name: str, meeting_name: str) -> str:
+    sanitized_meeting_name = meeting_name.replace(" ", "_").lower()
+    return f"{patient_name.lower()}_{sanitized_meeting_name}"[:63]
+
+
+def find_meeting_collections(patients: List[str]) -> Set[str]:
+    """
+    Meeting collections are recognised by their legacy name, or, for meetings
+    whose file is gone, by a manifest tracking exactly one file.
+    """
+    existing = {
+        collection.name for collection in index_registry.get_client().list_collections()
+    }
+    candidates = set()
+    for patient in patients:
+        patient_dir = os.path.join(config.PATIENT_DATA_DIR, patient)
+        for name in os.listdir(patient_dir):
+            if os.path.isfile(os.path.join(patient_dir, name)):
+                candidates.add(
+                    legacy_meeting_collection_name(patient, meeting_of(name))
+                )
+    for name in existing:
+        if len(get_manifest(name).files) == 1:
+            candidates.add(name)
+
+    keep = {GLOBAL_COLLECTION_NAME} | {patient_collection_name(p) for p in patients}
+    return {
+        name
+        for name in candidates & existing
+        if name not in keep and not name.endswith("_collection")
+    }
+
+
+def backfill_meeting_metadata(collection_name: str, dry_run: bool) -> int:
+    collection = index_registry.get_collection(collection_name)
+    updated = 0
+    for offset in range(0, collection.count(), BATCH_SIZE):
+        batch = collection.get(include=["metadatas"], offset=offset, limit=BATCH_SIZE)
+        ids, metadatas = [], []
+        for node_id, metadata in zip(batch["ids"], batch["metadatas"]):
+            if metadata.get(MEETING_KEY) or not metadata.get("file_path"):
+                continue
+            meeting = meeting_of(metadata["file_path"])
+            metadata = dict(metadata, **{MEETING_KEY: meeting})
+            # llama-index rebuilds nodes from the serialized copy, so keep
+            # that in line with the flat keys used for filtering.
+            if "_node_content" in metadata:
+                node: Dict = json.loads(metadata["_node_content"])
+                node.setdefault("metadata", {})[MEETING_KEY] = meeting
+                for key in (
+                    "excluded_embed_metadata_keys",
+                    "excluded_llm_metadata_keys",
+                ):
+                    excluded = node.setdefault(key, [])
+                    if MEETING_KEY not in excluded:
+                        excluded.append(MEETING_KEY)
+                metadata["_node_content"] = json.dumps(node)
+            ids.append(node_id)
+            metadatas.append(metadata)
+        if ids and not dry_run:
+            collection.update(ids=ids, metadatas=metadatas)
+        updated += len(ids)
+    return updated
+
+
+def drop_collection(collection_name: str) -> None:
+    index_registry.get_client().delete_collection(collection_name)
+    index_registry.invalidate(collection_name)
+    drop_manifest(collection_name)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    patients = list_patients()
+    before = len(index_registry.get_client().list_collections())
+    meeting_collections = find_meeting_collections(patients)
+
+    for patient in patients:
+        if not args.dry_run:
+            sync_patient_collection(patient)
+        collection_name = patient_collection_name(patient)
+        updated = backfill_meeting_metadata(collection_name, args.dry_run)
+        logger.info(
+            "Tagged %d nodes in %s with their meeting", updated, collection_name
+        )
+
+    for collection_name in sorted(meeting_collections):
+        logger.info("Dropping meeting collection %s", collection_name)
+        if not args.dry_run:
+            drop_collection(collection_name)
+
+    after = len(index_registry.get_client().list_collections())
+    logger.info(
+        "%s %d meeting collections: %d collections before, %d after",
+        "Would drop" if args.dry_run else "Dropped",
+        len(meeting_collections),
+        before,
+        after,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
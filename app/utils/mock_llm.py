@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import hashlib
+import random
+import threading
+import time
+from typing import Any, Iterator, List
+
+import botocore.exceptions
+from llama_index.core.base.llms.types import (
+    CompletionResponse,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.callbacks import llm_completion_callback
+from pydantic import PrivateAttr
+
+_VOCABULARY = (
+    "the patient session therapist reported progress with communication and "
+    "social skills during structured play while sensory breaks helped reduce "
+    "frustration and parents noted improved sleep routines at home"
+).split()
+
+
+class SimulatedLLM(CustomLLM):  # pylint: disable=too-many-ancestors
+    """
+    Deterministic local stand-in for Bedrock, for load tests and benchmarks.
+    Each answer depends only on the prompt, arrives after ``latency_ms`` and
+    then streams ``max_tokens`` words at ``tokens_per_second``. Selected with
+    ``LLM_PROVIDER=mock``.
+
+    With ``throttle_concurrency`` set, calls beyond that many at once fail
+    with the ClientError Bedrock raises for ThrottlingException.
+    """
+
+    tokens_per_second: float = 50.0
+    latency_ms: float = 200.0
+    max_tokens: int = 128
+    context_window: int = 200000
+    throttle_concurrency: int = 0
+    _active: int = PrivateAttr(default=0)
+    _active_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SimulatedLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.max_tokens,
+            model_name="simulated",
+        )
+
+    def _tokens(self, prompt: str) -> List[str]:
+        seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+        rng = random.Random(seed)
+        return [f"{rng.choice(_VOCABULARY)} " for _ in range(self.max_tokens)]
+
+    @property
+    def _token_interval(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _start_call(self) -> None:
+        with self._active_lock:
+            if 0 < self.throttle_concurrency <= self._active:
+                raise botocore.exceptions.ClientError(
+                    {
+                        "Error": {
+                            "Code": "ThrottlingException",
+                            "Message": "Too many requests, please wait.",
+                        }
+                    },
+                    "InvokeModel",
+                )
+            self._active += 1
+
+    def _end_call(self) -> None:
+        with self._active_lock:
+            self._active -= 1
+
+    @contextlib.contextmanager
+    def _call(self) -> Iterator[None]:
+        self._start_call()
+        try:
+            yield
+        finally:
+            self._end_call()
+
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        tokens = self._tokens(prompt)
+        with self._call():
+            time.sleep(self.latency_ms / 1000 + len(tokens) * self._token_interval)
+        return CompletionResponse(text="".join(tokens))
+
+    @llm_completion_callback()
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        tokens = self._tokens(prompt)
+        with self._call():
+            await asyncio.sleep(
+                self.latency_ms / 1000 + len(tokens) * self._token_interval
+            )
+        return CompletionResponse(text="".join(tokens))
+
+    @llm_completion_callback()
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        tokens = self._tokens(prompt)
+        # Like Bedrock, the request is made (and may be throttled) before the
+        # generator is returned.
+        self._start_call()
+
+        def gen() -> CompletionResponseGen:
+            try:
+                time.sleep(self.latency_ms / 1000)
+                text = ""
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(self._token_interval)
+                    text += token
+                    yield CompletionResponse(text=text, delta=token)
+            finally:
+                self._end_call()
+
+        return gen()
@@ -0,0 +1,155 @@
+import contextlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import chromadb
+
+from app.config import config
+from app.utils.metrics import INDEX_CACHE
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    index: Any
+    query_engine: Optional[Any] = None
+
+
+@dataclass
+class _KeyLock:
+    lock: threading.RLock
+    # Threads holding or waiting for the lock.
+    users: int = 0
+
+
+class IndexRegistry:  # pylint: disable=too-many-instance-attributes
+    """
+    Process-wide cache of the Chroma client, the vector indexes built on top of
+    its collections and the query engines wrapping those indexes.
+
+    Entries are kept in LRU order and bounded by ``max_entries``. Builds are
+    serialised per collection so concurrent requests never construct the same
+    index twice. A collection's lock is kept while the collection is cached
+    or in use, and dropped after that.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._key_locks: Dict[str, _KeyLock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = chromadb.PersistentClient(path=config.STORAGE_DIR)
+                    logger.info("Opened Chroma client at %s", config.STORAGE_DIR)
+        return self._client
+
+    def get_collection(self, collection_name: str):
+        return self.get_client().get_or_create_collection(collection_name)
+
+    @contextlib.contextmanager
+    def key_lock(self, key: str) -> Iterator[None]:
+        """Serialise builds and syncs of ``key``; reentrant."""
+        with self._lock:
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = _KeyLock(threading.RLock())
+            key_lock.users += 1
+        try:
+            with key_lock.lock:
+                yield
+        finally:
+            with self._lock:
+                key_lock.users -= 1
+                self._drop_key_lock(key)
+
+    def _drop_key_lock(self, key: str) -> None:
+        # Called with self._lock held.
+        key_lock = self._key_locks.get(key)
+        if key_lock is not None and not key_lock.users and key not in self._entries:
+            del self._key_locks[key]
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get_index(self, key: str, build: Callable[[], Any]):
+        entry = self._lookup(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            INDEX_CACHE.inc(result="hit")
+            return entry.index
+
+        with self.key_lock(key):
+            # Another request may have finished the build while we waited.
+            entry = self._lookup(key)
+            if entry is not None:
+                with self._lock:
+                    self.hits += 1
+                INDEX_CACHE.inc(result="hit")
+                return entry.index
+
+            with self._lock:
+                self.misses += 1
+            INDEX_CACHE.inc(result="miss")
+            index = build()
+            with self._lock:
+                self._entries[key] = _Entry(index=index)
+                self._evict()
+            return index
+
+    def get_query_engine(self, key: str, index, factory: Callable[[Any], Any]):
+        entry = self._lookup(key)
+        if entry is not None and entry.index is index and entry.query_engine:
+            return entry.query_engine
+
+        with self.key_lock(key):
+            entry = self._lookup(key)
+            if entry is None or entry.index is not index:
+                # The index was evicted or replaced; don't cache against it.
+                return factory(index)
+            if entry.query_engine is None:
+                entry.query_engine = factory(index)
+            return entry.query_engine
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                logger.info("Invalidated cached index for %s", key)
+            self._drop_key_lock(key)
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            self._drop_key_lock(key)
+            logger.info("Evicted cached index for %s", key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+index_registry = IndexRegistry(max_entries=config.INDEX_CACHE_SIZE)
@@ -0,0 +1,69 @@
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from llama_index.core import QueryBundle, Settings, VectorStoreIndex
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+
+from app.config import config
+
+_search_pool = ThreadPoolExecutor(
+    max_workers=config.GLOBAL_SEARCH_WORKERS, thread_name_prefix="federated-search"
+)
+
+
+class FederatedRetriever(BaseRetriever):
+    """
+    Searches several collections concurrently and merges their hits into a
+    single top-k by score. The query is embedded once and the embedding is
+    shared by every collection search.
+    """
+
+    def __init__(self, indexes: List[VectorStoreIndex], similarity_top_k: int):
+        self._similarity_top_k = similarity_top_k
+        self._retrievers = [
+            index.as_retriever(similarity_top_k=similarity_top_k) for index in indexes
+        ]
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = (
+                Settings.embed_model.get_agg_embedding_from_queries(
+                    query_bundle.embedding_strs
+                )
+            )
+        results = _search_pool.map(
+            lambda retriever: retriever.retrieve(query_bundle), self._retrievers
+        )
+        # Every collection uses the same embedding model and distance, so the
+        # scores are directly comparable.
+        return heapq.nlargest(
+            self._similarity_top_k,
+            (node for nodes in results for node in nodes),
+            key=lambda node: node.score or 0.0,
+        )
+
+
+class RemoteRetriever(BaseRetriever):
+    """
+    Retrieves from a collection held by the index-owner process. ``scope``
+    names the collection as understood by ``IndexService.retrieve``, e.g.
+    ``("patient", name)``. The query is embedded by the owner unless the
+    bundle already carries an embedding.
+    """
+
+    def __init__(self, client, scope: Tuple[str, ...], similarity_top_k: int):
+        self._client = client
+        self._scope = scope
+        self._similarity_top_k = similarity_top_k
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._client.retrieve(
+            self._scope,
+            query_bundle.query_str,
+            query_bundle.embedding,
+            self._similarity_top_k,
+        )
@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List
+
+import tiktoken
+from llama_index.core.utils import get_tokenizer
+
+from app.config import config
+from app.utils.llm import acomplete
+from app.utils.llm_governor import INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TEMPLATE = """You are an AI Psychologist with a specialty of diagnosing Autism in children.
+The following is a transcription of a conversation between our Staff and one or more parent/guardian of a child with Autism, and may even include a translator - You will need to determine the speakers.
+Your job is to review the transcription and provide an extremely detailed summary of the conversation that includes as much a detail as possible.
+
+{text}
+
+Summary:"""
+
+REDUCE_TEMPLATE = """You are an AI Psychologist with a specialty of diagnosing Autism in children.
+The following are detailed summaries of consecutive parts of one or more conversations between our Staff and one or more parent/guardian of a child with Autism.
+Combine them into a single, extremely detailed summary. Keep every clinically relevant detail and do not mention that the input was split into parts.
+
+{text}
+
+Summary:"""
+
+# Changes whenever the prompts or model change, so cached summaries made with
+# an older prompt are not reused.
+SUMMARY_PROMPT_VERSION = hashlib.sha256(
+    "\n".join(
+        [
+            config.BEDROCK_MODEL,
+            SUMMARY_TEMPLATE,
+            REDUCE_TEMPLATE,
+            str(config.SUMMARY_CHUNK_TOKENS),
+        ]
+    ).encode("utf-8")
+).hexdigest()[:16]
+
+# A speaker turn starts a line, optionally after a timestamp, e.g.
+# "Speaker 1: ...", "Dr. Smith: ..." or "[00:12:03] Parent: ...".
+_SPEAKER_TURN = re.compile(
+    r"^[ \t]*(?:\[[\d:.\s-]+\][ \t]*)?[A-Z][\w .'-]{0,30}:\s", re.MULTILINE
+)
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class SummaryResult:
+    text: str
+    chunks: int = 0
+    reduce_levels: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding():
+    # llama_index bundles the cl100k_base ranks; loading its tokenizer first
+    # registers the encoding so tiktoken never needs to download it.
+    get_tokenizer()
+    return tiktoken.get_encoding(config.SUMMARY_TOKENIZER)
+
+
+def split_turns(text: str) -> List[str]:
+    starts = [m.start() for m in _SPEAKER_TURN.finditer(text)]
+    if starts:
+        bounds = sorted({0, *starts, len(text)})
+        segments = [text[a:b] for a, b in zip(bounds, bounds[1:])]
+    else:
+        segments = _PARAGRAPH.split(text)
+    return [segment for segment in segments if segment.strip()]
+
+
+def _segments(text: str, max_tokens: int, encoding) -> Iterator[str]:
+    """Speaker turns, split further by sentence and then by raw token windows."""
+    for turn in split_turns(text):
+        if len(encoding.encode(turn)) <= max_tokens:
+            yield turn
+            continue
+        for sentence in _SENTENCE_END.split(turn):
+            tokens = encoding.encode(sentence)
+            if len(tokens) <= max_tokens:
+                yield sentence + " "
+                continue
+            for start in range(0, len(tokens), max_tokens):
+                yield encoding.decode(tokens[start : start + max_tokens])
+
+
+def chunk_text(text: str, max_tokens: int, encoding=None) -> List[str]:
+    encoding = encoding or get_encoding()
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for segment in _segments(text, max_tokens, encoding):
+        tokens = len(encoding.encode(segment))
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _pack(summaries: List[str], max_tokens: int, encoding) -> List[str]:
+    groups: List[List[str]] = []
+    group_tokens = 0
+    for summary in summaries:
+        tokens = len(encoding.encode(summary))
+        if groups and group_tokens + tokens <= max_tokens:
+            groups[-1].append(summary)
+            group_tokens += tokens
+        else:
+            groups.append([summary])
+            group_tokens = tokens
+    if len(groups) == len(summaries):
+        # Every summary fills the budget on its own; merge pairs so each level
+        # still halves the number of summaries.
+        groups = [summaries[i : i + 2] for i in range(0, len(summaries), 2)]
+    return ["\n\n".join(group) for group in groups]
+
+
+async def _complete_all(
+    template: str, texts: List[str], limit: asyncio.Semaphore, priority: str
+):
+    async def run(text: str) -> str:
+        async with limit:
+            return await acomplete(template.format(text=text), priority=priority)
+
+    return await asyncio.gather(*(run(text) for text in texts))
+
+
+async def summarize_text(text: str, priority: str = INTERACTIVE) -> SummaryResult:
+    """
+    Map-reduce summarization: the text is chunked on speaker turns to at most
+    SUMMARY_CHUNK_TOKENS tokens, chunks are summarized concurrently (bounded
+    by SUMMARY_CONCURRENCY and the LLM governor at ``priority``), and the
+    partial summaries are combined level by level until one summary remains.
+    """
+    encoding = get_encoding()
+    limit = asyncio.Semaphore(config.SUMMARY_CONCURRENCY)
+    result = SummaryResult(text="")
+
+    started = time.perf_counter()
+    chunks = chunk_text(text, config.SUMMARY_CHUNK_TOKENS, encoding)
+    result.chunks = len(chunks)
+    result.timings["chunk"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    summaries = await _complete_all(SUMMARY_TEMPLATE, chunks, limit, priority)
+    result.timings["map"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    while len(summaries) > 1:
+        groups = _pack(summaries, config.SUMMARY_CHUNK_TOKENS, encoding)
+        summaries = await _complete_all(REDUCE_TEMPLATE, groups, limit, priority)
+        result.reduce_levels += 1
+    result.timings["reduce"] = time.perf_counter() - started
+
+    result.text = summaries[0] if summaries else ""
+    logger.info(
+        "Summarized %d chunks in %d reduce levels (chunk %.2fs, map %.2fs, reduce %.2fs)",
+        result.chunks,
+        result.reduce_levels,
+        result.timings["chunk"],
+        result.timings["map"],
+        result.timings["reduce"],
+    )
+    return result
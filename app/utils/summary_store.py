@@ -0,0 +1,147 @@
+import asyncio
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import config
+from app.utils.summarize import SUMMARY_PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryStore:  # pylint: disable=too-many-instance-attributes
+    """
+    File summaries on disk, addressed by the SHA-256 of the file content and
+    the summarization prompt version, so an edited file or a new prompt never
+    gets a stale summary.
+
+    Concurrent requests for the same summary share one LLM call, writes are
+    atomic, and the least recently read summaries are evicted once the store
+    grows beyond ``max_bytes``. The size is scanned once and then tracked as
+    summaries are written; the store is only walked again to evict.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._evict_lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(
+            self.root, content_hash[:2], f"{content_hash}-{SUMMARY_PROMPT_VERSION}.txt"
+        )
+
+    def get(self, content_hash: str) -> Optional[str]:
+        path = self._path(content_hash)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                text = file.read()
+        except FileNotFoundError:
+            return None
+        # The modification time doubles as the last access time for eviction.
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return text
+
+    def put(self, content_hash: str, text: str) -> None:
+        path = self._path(content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".summary-", suffix=".part", dir=os.path.dirname(path)
+        )
+        replaced = 0
+        with contextlib.suppress(OSError):
+            replaced = os.stat(path).st_size
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(text)
+            written = os.stat(tmp_path).st_size
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+        self._grow(written - replaced)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".txt"):
+                    path = os.path.join(directory, name)
+                    with contextlib.suppress(OSError):
+                        stat = os.stat(path)
+                        entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _grow(self, delta: int) -> None:
+        with self._evict_lock:
+            if self._total_bytes is None:
+                # First write: the scan already counts it.
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += delta
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+                logger.info("Evicted summary %s", path)
+            total -= size
+        self._total_bytes = total
+
+    async def get_or_create(
+        self, content_hash: str, create: Callable[[], Awaitable[str]]
+    ) -> str:
+        task = self._inflight.get(content_hash)
+        if task is None:
+            cached = await asyncio.to_thread(self.get, content_hash)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            # Another caller may have started it while the disk was read.
+            task = self._inflight.get(content_hash)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._create(content_hash, create))
+            self._inflight[content_hash] = task
+            task.add_done_callback(lambda _: self._inflight.pop(content_hash, None))
+        else:
+            self.shared += 1
+        # Shielded so a caller that goes away does not cancel the summary the
+        # other callers are waiting for.
+        return await asyncio.shield(task)
+
+    async def _create(
+        self, content_hash: str, create: Callable[[], Awaitable[str]]
+    ) -> str:
+        text = await create()
+        await asyncio.to_thread(self.put, content_hash, text)
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "inflight": len(self._inflight),
+        }
+
+
+summary_store = SummaryStore(
+    root=config.SUMMARY_STORE_DIR, max_bytes=config.SUMMARY_STORE_MAX_BYTES
+)
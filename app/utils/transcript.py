@@ -0,0 +1,252 @@
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from llama_index.core import Document
+from llama_index.core.readers.base import BaseReader
+
+from app.config import config
+
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s*$")
+
+# Only used to locate and order nodes; the readable time range is kept for
+# the embedding and the LLM context instead.
+_HIDDEN_METADATA = ["start_time", "end_time"]
+
+
+class _JsonStream:
+    """
+    Minimal incremental JSON reader: walks the top-level object of a file
+    without loading it, decoding one array element at a time and skipping
+    values it is not interested in.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = 64 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos : self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number running into the end of the buffer may be cut short.
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self) -> None:
+        if self.peek() != '"':
+            self.value()
+            return
+        # Strings are scanned rather than decoded so that a huge value (the
+        # full transcript text) never has to be held in memory.
+        i = self.pos + 1
+        while True:
+            while i < len(self.buf):
+                char = self.buf[i]
+                if char == "\\":
+                    i += 2
+                elif char == '"':
+                    self.pos = i + 1
+                    return
+                else:
+                    i += 1
+            overshoot = i - len(self.buf)
+            self.pos = len(self.buf)
+            if not self._fill():
+                raise ValueError("Unterminated string")
+            i = self.pos + overshoot
+
+    def items(self, keys: Tuple[str, ...]) -> Iterator[Tuple[str, Any]]:
+        """Yield ``(key, element)`` for each element of the arrays in ``keys``."""
+        self.expect("{")
+        while self.peek() != "}":
+            key = self.value()
+            self.expect(":")
+            if key in keys and self.peek() == "[":
+                self.pos += 1
+                while self.peek() != "]":
+                    yield key, self.value()
+                    if self.peek() == ",":
+                        self.pos += 1
+                self.pos += 1
+            else:
+                self.skip()
+            if self.peek() == ",":
+                self.pos += 1
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def _span(entry: Dict) -> Tuple[Optional[float], Optional[float]]:
+    timestamp = entry.get("timestamp") or [None, None]
+    return timestamp[0], timestamp[1]
+
+
+@dataclass
+class _Window:
+    start: float
+    end: float
+    lines: List[str] = field(default_factory=list)
+    speakers: List[str] = field(default_factory=list)
+    speaker: Optional[str] = None
+
+    def add(self, text: str, end: float, speaker: Optional[str]) -> None:
+        if speaker is not None and speaker != self.speaker:
+            self.lines.append(f"{speaker}: {text}")
+            if speaker not in self.speakers:
+                self.speakers.append(speaker)
+        elif self.lines:
+            self.lines[-1] = f"{self.lines[-1]} {text}"
+        else:
+            self.lines.append(text)
+        self.speaker = speaker
+        self.end = end
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+class TranscriptReader(BaseReader):
+    """
+    Reader for Whisper-style transcript exports: a JSON object with a
+    ``chunks`` list of ``{"timestamp": [start, end], "text": ...}`` entries and
+    an optional ``speakers`` list of diarized segments in the same shape plus
+    a ``speaker`` label.
+
+    The file is parsed incrementally and consecutive chunks are merged into
+    windows of about ``window_seconds`` that end on a sentence boundary, each
+    becoming one Document with its time range and speakers as metadata. JSON
+    files that are not transcripts are read as plain text.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = config.TRANSCRIPT_WINDOW_SECONDS,
+        max_window_seconds: Optional[float] = None,
+    ):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self.max_window_seconds = max_window_seconds or 2 * window_seconds
+
+    def lazy_load_data(self, *args: Any, **load_kwargs: Any) -> Iterator[Document]:
+        """
+        Load ``file`` (the first argument) with ``extra_info`` (the second) as
+        metadata; SimpleDirectoryReader passes the latter by keyword.
+        """
+        file = Path(args[0] if args else load_kwargs["file"])
+        extra_info = (args[1] if len(args) > 1 else load_kwargs.get("extra_info")) or {}
+        windows = self._windows(file)
+        try:
+            first = next(windows, None)
+        except ValueError:
+            first = None
+        if first is None:
+            yield Document(
+                text=Path(file).read_text(encoding="utf-8"), metadata=extra_info
+            )
+            return
+        yield self._document(first, extra_info)
+        for window in windows:
+            yield self._document(window, extra_info)
+
+    def _windows(self, file: Path) -> Iterator[_Window]:
+        # Diarization segments come before the chunks in these exports, so
+        # they are known by the time the chunks they cover are read.
+        speakers: List[Tuple[float, float, str]] = []
+        window: Optional[_Window] = None
+        with open(file, "r", encoding="utf-8") as handle:
+            for key, entry in _JsonStream(handle).items(("speakers", "chunks")):
+                if key == "speakers":
+                    start, end = _span(entry)
+                    if start is not None and entry.get("speaker"):
+                        speakers.append((start, end or start, entry["speaker"]))
+                    continue
+
+                text = (entry.get("text") or "").strip()
+                start, end = _span(entry)
+                if not text or start is None:
+                    continue
+                end = end if end is not None else start
+                if window is None:
+                    window = _Window(start=start, end=end)
+                window.add(text, end, self._speaker_at(speakers, start, end))
+
+                duration = window.end - window.start
+                if (
+                    duration >= self.window_seconds and _SENTENCE_END.search(text)
+                ) or duration >= self.max_window_seconds:
+                    yield window
+                    window = None
+        if window is not None:
+            yield window
+
+    @staticmethod
+    def _speaker_at(
+        speakers: List[Tuple[float, float, str]], start: float, end: float
+    ) -> Optional[str]:
+        best, best_overlap = None, 0.0
+        for speaker_start, speaker_end, speaker in speakers:
+            overlap = min(end, speaker_end) - max(start, speaker_start)
+            if overlap > best_overlap:
+                best, best_overlap = speaker, overlap
+        return best
+
+    @staticmethod
+    def _document(window: _Window, extra_info: Dict) -> Document:
+        metadata = {
+            **extra_info,
+            "start_time": window.start,
+            "end_time": window.end,
+            "time_range": (
+                f"{format_timestamp(window.start)}-{format_timestamp(window.end)}"
+            ),
+        }
+        if window.speakers:
+            metadata["speakers"] = ", ".join(window.speakers)
+        return Document(
+            text=window.text,
+            metadata=metadata,
+            excluded_embed_metadata_keys=list(_HIDDEN_METADATA),
+            excluded_llm_metadata_keys=list(_HIDDEN_METADATA),
+        )
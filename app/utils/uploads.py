@@ -0,0 +1,63 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Tuple
+
+from fastapi import UploadFile
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the maximum size of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+def _write_chunk(out: BinaryIO, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+
+def _finish(out: BinaryIO) -> None:
+    out.flush()
+    os.fsync(out.fileno())
+    out.close()
+
+
+async def save_upload(
+    file: UploadFile, destination: str, max_bytes: int
+) -> Tuple[int, str]:
+    """
+    Stream ``file`` to ``destination`` in fixed-size chunks, hashing as it goes.
+
+    Chunks are written from a worker thread into a hidden temp file next to
+    ``destination`` which is renamed into place only once the upload is
+    complete, so readers never see a partial file. Returns the size in bytes
+    and the SHA-256 of the content.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=".upload-", suffix=".part", dir=os.path.dirname(destination)
+    )
+    out = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(max_bytes)
+            await asyncio.to_thread(_write_chunk, out, digest, chunk)
+        await asyncio.to_thread(_finish, out)
+        await asyncio.to_thread(os.replace, tmp_path, destination)
+    except BaseException:
+        out.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    return size, digest.hexdigest()
@@ -0,0 +1,84 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from llama_index.core import Settings
+
+from app.arize_client import setup_arize_client
+from app.config import config
+from app.utils.index import (
+    collection_is_empty,
+    ensure_embed_model,
+    ensure_llm,
+    open_index,
+)
+from app.utils.index_client import index_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupState:
+    ready: bool = False
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    steps: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "startup_seconds": (
+                self.finished_at - self.started_at if self.finished_at else None
+            ),
+            "steps": self.steps,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _timed(name: str, step) -> None:
+    started = time.perf_counter()
+    step()
+    warmup_state.steps[name] = time.perf_counter() - started
+    logger.info("Warm-up step %s took %.2fs", name, warmup_state.steps[name])
+
+
+def _open_hot_collections() -> None:
+    for collection_name in config.WARMUP_COLLECTIONS:
+        # Collections that were never built are left to their first request
+        # rather than ingested during startup.
+        if not collection_is_empty(collection_name):
+            open_index(collection_name)
+
+
+def warm_up() -> None:
+    """
+    Load everything the first request would otherwise pay for, then mark the
+    process ready. Blocking; run it off the event loop.
+    """
+    try:
+        _timed("tracing", setup_arize_client)
+        if config.WARMUP_ENABLED and index_client is not None:
+            # The index owner holds the embedding model and the collections.
+            _timed("llm", ensure_llm)
+            _timed("index_server", index_client.connect)
+        elif config.WARMUP_ENABLED:
+            _timed("llm", ensure_llm)
+            _timed("embed_model", ensure_embed_model)
+            _timed("embed", lambda: Settings.embed_model.get_query_embedding("warm-up"))
+            _timed("collections", _open_hot_collections)
+        warmup_state.ready = True
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("Warm-up failed: %s", str(e))
+        warmup_state.error = str(e)
+    finally:
+        warmup_state.finished_at = time.time()
+        logger.info(
+            "Startup finished in %.2fs (ready: %s)",
+            warmup_state.finished_at - warmup_state.started_at,
+            warmup_state.ready,
+        )
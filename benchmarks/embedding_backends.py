@@ -0,0 +1,117 @@
+"""
+Compare the torch and ONNX Runtime embedding backends.
+
+Reports cold-start time (model load plus first embedding), embeddings/sec and
+the cosine similarity of each ONNX variant against the torch model. Exits
+non-zero when the mean cosine similarity falls below ``--min-cosine``.
+
+    python -m benchmarks.embedding_backends --texts "output (1).json" -n 512
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.config import config
+from app.utils.embedding import OnnxEmbedding
+
+
+def load_texts(path: str, limit: int) -> List[str]:
+    with open(path, "r", encoding="utf-8") as file:
+        if path.endswith(".json"):
+            texts = [chunk["text"].strip() for chunk in json.load(file)["chunks"]]
+        else:
+            texts = [line.strip() for line in file]
+    texts = [text for text in texts if text]
+    return (texts * (limit // max(len(texts), 1) + 1))[:limit]
+
+
+def torch_backend():
+    # pylint: disable=import-outside-toplevel
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    return HuggingFaceEmbedding(model_name=config.EMBEDDING_MODEL)
+
+
+def onnx_backend(quantized: bool) -> Callable[[], OnnxEmbedding]:
+    def load():
+        return OnnxEmbedding(
+            model_name=config.EMBEDDING_MODEL,
+            model_dir=config.EMBEDDING_ONNX_DIR,
+            quantized=quantized,
+            num_threads=config.EMBEDDING_ONNX_THREADS,
+            query_instruction=config.EMBEDDING_QUERY_INSTRUCTION,
+        )
+
+    return load
+
+
+def run_backend(load: Callable, texts: List[str], queries: List[str]) -> Dict:
+    started = time.perf_counter()
+    model = load()
+    model.get_text_embedding(texts[0])
+    cold_start = time.perf_counter() - started
+
+    started = time.perf_counter()
+    text_embeddings = model.get_text_embedding_batch(texts)
+    elapsed = time.perf_counter() - started
+    query_embeddings = [model.get_query_embedding(query) for query in queries]
+    return {
+        "cold_start_s": cold_start,
+        "embeddings_per_s": len(texts) / elapsed,
+        "text": np.array(text_embeddings),
+        "query": np.array(query_embeddings),
+    }
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", default="output (1).json")
+    parser.add_argument("-n", "--num-texts", type=int, default=512)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, args.num_texts)
+    queries = texts[:32]
+    backends = {
+        "torch": torch_backend,
+        "onnx-fp32": onnx_backend(quantized=False),
+        "onnx-int8": onnx_backend(quantized=True),
+    }
+    results = {
+        name: run_backend(load, texts, queries) for name, load in backends.items()
+    }
+
+    reference = results["torch"]
+    ok = True
+    print(
+        f"{'backend':<10} {'cold start s':>12} {'emb/s':>10} {'cos mean':>9} {'cos min':>9}"
+    )
+    for name, result in results.items():
+        similarities = np.concatenate(
+            [
+                cosine(result["text"], reference["text"]),
+                cosine(result["query"], reference["query"]),
+            ]
+        )
+        print(
+            f"{name:<10} {result['cold_start_s']:>12.2f} "
+            f"{result['embeddings_per_s']:>10.1f} "
+            f"{similarities.mean():>9.4f} {similarities.min():>9.4f}"
+        )
+        ok &= bool(similarities.mean() >= args.min_cosine)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
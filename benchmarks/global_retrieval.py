@@ -0,0 +1,149 @@
+"""
+Compare federated global retrieval with the duplicated global collection.
+
+Builds both layouts from ``--data-dir`` into a scratch Chroma directory: one
+collection per patient (searched by FederatedRetriever) and a single global
+collection with a second copy of every chunk on top of those. Reports the
+build time and stored chunk count of each layout, and its retrieval latency
+and recall@k against an exact brute-force search over all chunk embeddings.
+
+    python -m benchmarks.global_retrieval --data-dir patient_data -n 50 -k 10
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+from llama_index.core import QueryBundle, Settings
+
+from app.config import config
+from app.utils import index as ix
+from app.utils.registry import index_registry
+from app.utils.retrieval import FederatedRetriever
+
+DUPLICATED_COLLECTION = "benchmark_duplicated"
+
+
+def chunk_key(metadata: Dict, text: str) -> Tuple[str, str]:
+    return metadata.get("file_path", ""), text
+
+
+def build_federated(patients: Dict[str, List[str]]) -> Tuple[float, int]:
+    started = time.perf_counter()
+    for patient in patients:
+        ix.sync_patient_collection(patient)
+    elapsed = time.perf_counter() - started
+    count = sum(
+        index_registry.get_collection(ix.patient_collection_name(patient)).count()
+        for patient in patients
+    )
+    return elapsed, count
+
+
+def build_duplicated(patients: Dict[str, List[str]]) -> Tuple[float, int]:
+    started = time.perf_counter()
+    ix.sync_collection(
+        DUPLICATED_COLLECTION, [path for files in patients.values() for path in files]
+    )
+    elapsed = time.perf_counter() - started
+    return elapsed, index_registry.get_collection(DUPLICATED_COLLECTION).count()
+
+
+def exact_top_k(query_embeddings: np.ndarray, k: int) -> List[Set[Tuple[str, str]]]:
+    chunks = index_registry.get_collection(DUPLICATED_COLLECTION).get(
+        include=["embeddings", "documents", "metadatas"]
+    )
+    embeddings = np.asarray(chunks["embeddings"])
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    keys = [
+        chunk_key(metadata, text)
+        for metadata, text in zip(chunks["metadatas"], chunks["documents"])
+    ]
+    scores = query_embeddings @ embeddings.T
+    return [{keys[i] for i in np.argsort(-row)[:k]} for row in scores]
+
+
+def run_layout(retriever, queries: List[str], embeddings: np.ndarray, truth, k: int):
+    latencies, recalls = [], []
+    for query, embedding, expected in zip(queries, embeddings, truth):
+        bundle = QueryBundle(query_str=query, embedding=embedding.tolist())
+        started = time.perf_counter()
+        nodes = retriever.retrieve(bundle)
+        latencies.append(time.perf_counter() - started)
+        found = {chunk_key(n.node.metadata, n.node.get_content()) for n in nodes}
+        recalls.append(len(found & expected) / k)
+    return {
+        "p50_ms": np.percentile(latencies, 50) * 1000,
+        "p95_ms": np.percentile(latencies, 95) * 1000,
+        "recall": float(np.mean(recalls)),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data-dir", default=config.PATIENT_DATA_DIR)
+    parser.add_argument("-n", "--num-queries", type=int, default=50)
+    parser.add_argument("-k", "--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config.PATIENT_DATA_DIR = args.data_dir
+    config.STORAGE_DIR = tempfile.mkdtemp(prefix="global-retrieval-")
+    try:
+        patients = ix._list_patient_files()  # pylint: disable=protected-access
+        federated = build_federated(patients)
+        duplicated = build_duplicated(patients)
+        # The duplicated layout keeps the patient collections as well.
+        builds = {
+            "federated": federated,
+            "duplicated": (federated[0] + duplicated[0], federated[1] + duplicated[1]),
+        }
+
+        # Queries are the opening words of randomly sampled chunks.
+        documents = index_registry.get_collection(DUPLICATED_COLLECTION).get(
+            include=["documents"]
+        )["documents"]
+        random.Random(args.seed).shuffle(documents)
+        queries = [
+            " ".join(text.split()[:12]) for text in documents[: args.num_queries]
+        ]
+        embeddings = np.asarray(
+            [Settings.embed_model.get_query_embedding(query) for query in queries]
+        )
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        truth = exact_top_k(embeddings, args.top_k)
+
+        retrievers = {
+            "federated": FederatedRetriever(
+                [ix.open_index(ix.patient_collection_name(p)) for p in patients],
+                similarity_top_k=args.top_k,
+            ),
+            "duplicated": ix.open_index(DUPLICATED_COLLECTION).as_retriever(
+                similarity_top_k=args.top_k
+            ),
+        }
+
+        print(
+            f"{len(patients)} patients, {len(queries)} queries, k={args.top_k}\n"
+            f"{'layout':<11} {'build s':>8} {'chunks':>7} "
+            f"{'p50 ms':>7} {'p95 ms':>7} {'recall':>7}"
+        )
+        for name, retriever in retrievers.items():
+            result = run_layout(retriever, queries, embeddings, truth, args.top_k)
+            build_s, chunks = builds[name]
+            print(
+                f"{name:<11} {build_s:>8.2f} {chunks:>7} {result['p50_ms']:>7.2f} "
+                f"{result['p95_ms']:>7.2f} {result['recall']:>7.3f}"
+            )
+    finally:
+        shutil.rmtree(config.STORAGE_DIR, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Interactive LLM latency while a batch job floods a throttling provider.
+
+Runs in-process against the simulated LLM with a concurrency quota
+(``--quota``, above which it answers ThrottlingException like Bedrock).
+``--batch`` summary-sized calls are queued at batch priority at once, like a
+global rebuild, while ``--interactive`` calls arrive every ``--interval``
+seconds. Reports interactive latency percentiles, how long the batch took,
+and the governor's throttles, drops and final limit. ``--stream`` sends the
+interactive calls through ``TokenStream`` like ``/ask`` does, timing them to
+their last token. ``--ungoverned`` runs the same load with the scheduling
+disabled (no practical limit, no AIMD, no batch share) for comparison.
+
+    python -m benchmarks.llm_governor --quota 4 --batch 60 --interactive 20
+    python -m benchmarks.llm_governor --quota 4 --batch 60 --interactive 20 --stream
+    python -m benchmarks.llm_governor --quota 4 --batch 60 --interactive 20 --ungoverned
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+from llama_index.core import PromptTemplate, Settings
+
+from app.config import config
+from app.utils import llm
+from app.utils.llm_governor import BATCH, INTERACTIVE, LLMGovernor
+from app.utils.mock_llm import SimulatedLLM
+
+STREAM_PROMPT = PromptTemplate("{query_str}")
+
+
+async def _stream(prompt: str, priority: str) -> None:
+    stream = llm.TokenStream(STREAM_PROMPT, priority=priority, query_str=prompt)
+    async for _ in stream.async_response_gen():
+        pass
+
+
+async def timed(
+    prompt: str, priority: str, latencies: List[float], stream: bool = False
+) -> None:
+    started = time.perf_counter()
+    try:
+        if stream:
+            await _stream(prompt, priority)
+        else:
+            await llm.acomplete(prompt, priority=priority)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        print(f"{priority} call failed: {e!r}")
+        return
+    latencies.append(time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace) -> None:
+    interactive: List[float] = []
+    batch: List[float] = []
+    started = time.perf_counter()
+    batch_tasks = [
+        asyncio.create_task(timed(f"summary {i}", BATCH, batch))
+        for i in range(args.batch)
+    ]
+    probes = []
+    for i in range(args.interactive):
+        probes.append(
+            asyncio.create_task(
+                timed(f"question {i}", INTERACTIVE, interactive, args.stream)
+            )
+        )
+        await asyncio.sleep(args.interval)
+    await asyncio.gather(*probes)
+    await asyncio.gather(*batch_tasks)
+    elapsed = time.perf_counter() - started
+
+    interactive.sort()
+    if interactive:
+        print(
+            f"interactive: {len(interactive)}/{args.interactive} ok, "
+            f"p50 {statistics.median(interactive) * 1000:.0f}ms, "
+            f"p95 {interactive[int(0.95 * (len(interactive) - 1))] * 1000:.0f}ms"
+        )
+    print(f"batch: {len(batch)}/{args.batch} ok, all done after {elapsed:.1f}s")
+    print(f"governor: {llm.llm_governor.stats()}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quota", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=60)
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--ungoverned", action="store_true")
+    args = parser.parse_args()
+
+    Settings.llm = SimulatedLLM(
+        tokens_per_second=0,
+        latency_ms=args.latency_ms,
+        max_tokens=16,
+        throttle_concurrency=args.quota,
+    )
+    if args.ungoverned:
+        llm.llm_governor = LLMGovernor(
+            max_concurrency=10000, decrease=1.0, batch_share=1.0
+        )
+    else:
+        llm.llm_governor = LLMGovernor(
+            max_concurrency=config.LLM_MAX_CONCURRENCY,
+            min_concurrency=config.LLM_MIN_CONCURRENCY,
+            increase=config.LLM_AIMD_INCREASE,
+            decrease=config.LLM_AIMD_DECREASE,
+            batch_share=config.LLM_BATCH_SHARE,
+            deadlines={INTERACTIVE: config.LLM_INTERACTIVE_DEADLINE_SECONDS},
+        )
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+Offline load test of the whole service, with no AWS access needed.
+
+Generates a synthetic corpus of ``--patients`` x ``--transcripts`` meeting
+transcripts, starts ``uvicorn main:app`` in a scratch directory with the
+simulated LLM (``LLM_PROVIDER=mock``, see app/utils/mock_llm.py), then:
+
+1. uploads every transcript through /api/upload-patient-file and waits for the
+   ingestion jobs, reporting ingestion documents/s;
+2. sends ``--requests`` requests per endpoint with ``--concurrency`` in flight
+   to /ask_patient, /ask_meeting, /ask_global and /api/summarize-patient-file,
+   reporting throughput, p50/p95/p99 latency and time to first byte.
+
+The report includes the server's peak RSS and the git commit. The corpus,
+prompts and LLM output are seeded, so reports from different commits can be
+compared. Save them with ``--output`` and diff them with ``--compare``:
+
+    python -m benchmarks.load_test --output before.json
+    python -m benchmarks.load_test --compare before.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "today we worked on turn taking during play and the child responded well "
+    "to visual schedules mom reported fewer meltdowns at school transitions "
+    "remain difficult we practiced requesting with short phrases and the "
+    "sensory diet was adjusted to include movement breaks before circle time"
+).split()
+SPEAKERS = ("Therapist", "Parent", "Child")
+QUESTIONS = (
+    "What progress has been made with communication?",
+    "Summarize the most recent session",
+    "Which strategies helped with transitions?",
+    "What did the parents report about sleep?",
+)
+
+Request = Tuple[str, str, Optional[dict]]
+
+
+def make_corpus(
+    root: str, patients: int, transcripts: int, words: int, seed: int
+) -> Dict[str, List[str]]:
+    """Write the transcripts under ``root`` and return the files per patient."""
+    rng = random.Random(seed)
+    corpus = {}
+    for p in range(patients):
+        patient = f"patient_{p:04d}"
+        os.makedirs(os.path.join(root, patient))
+        corpus[patient] = []
+        for m in range(transcripts):
+            lines, remaining = [], words
+            while remaining > 0:
+                count = min(remaining, rng.randint(8, 30))
+                text = " ".join(rng.choice(WORDS) for _ in range(count))
+                lines.append(f"{rng.choice(SPEAKERS)}: {text.capitalize()}.")
+                remaining -= count
+            name = f"meeting_{m:03d}.txt"
+            with open(os.path.join(root, patient, name), "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+            corpus[patient].append(name)
+    return corpus
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def git_commit() -> Dict[str, object]:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "-s"))}
+
+
+def send(port: int, request: Request) -> Tuple[float, float, int]:
+    """Latency, time to first byte and status of one request."""
+    method, path, body = request
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    started = time.perf_counter()
+    try:
+        if body is None:
+            connection.request(method, path)
+        else:
+            connection.request(
+                method,
+                path,
+                body=json.dumps(body),
+                headers={"Content-Type": "application/json"},
+            )
+        response = connection.getresponse()
+        response.read(1)
+        first_byte = time.perf_counter() - started
+        response.read()
+        return time.perf_counter() - started, first_byte, response.status
+    finally:
+        connection.close()
+
+
+def multipart(file_name: str, content: bytes) -> dict:
+    boundary = uuid.uuid4().hex
+    body = (
+        (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+            "Content-Type: text/plain\r\n\r\n"
+        ).encode()
+        + content
+        + f"\r\n--{boundary}--\r\n".encode()
+    )
+    return {
+        "multipart": body,
+        "content_type": f"multipart/form-data; boundary={boundary}",
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_load(port: int, requests: List[Request], concurrency: int) -> dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda request: send(port, request), requests))
+    elapsed = time.perf_counter() - started
+    ok = [result for result in results if result[2] < 400]
+    latencies = [result[0] for result in ok] or [float("nan")]
+    first_bytes = [result[1] for result in ok] or [float("nan")]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "throughput_rps": len(ok) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "ttft_p50_ms": statistics.median(first_bytes) * 1000,
+        "ttft_p95_ms": percentile(first_bytes, 0.95) * 1000,
+    }
+
+
+def ingest(port: int, staging: str, corpus: Dict[str, List[str]], concurrency: int):
+    uploads = []
+    for patient, files in corpus.items():
+        for name in files:
+            with open(os.path.join(staging, patient, name), "rb") as file:
+                uploads.append((patient, name, file.read()))
+
+    def upload(item) -> str:
+        patient, name, content = item
+        body = multipart(name, content)
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/api/upload-patient-file?patient_name={patient}",
+            data=body["multipart"],
+            headers={"Content-Type": body["content_type"]},
+        )
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return json.loads(response.read())["job_id"]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        job_ids = set(pool.map(upload, uploads))
+    failed = 0
+    while job_ids:
+        for job_id in list(job_ids):
+            url = f"http://127.0.0.1:{port}/api/jobs/{job_id}"
+            with urllib.request.urlopen(url, timeout=30) as response:
+                status = json.loads(response.read())["status"]
+            if status in ("completed", "failed"):
+                failed += status == "failed"
+                job_ids.discard(job_id)
+        time.sleep(0.2)
+    elapsed = time.perf_counter() - started
+    return {
+        "documents": len(uploads),
+        "failed_jobs": failed,
+        "seconds": elapsed,
+        "docs_per_second": len(uploads) / elapsed,
+    }
+
+
+def scenarios(
+    corpus: Dict[str, List[str]], count: int, seed: int
+) -> Dict[str, List[Request]]:
+    rng = random.Random(seed)
+    patients = sorted(corpus)
+
+    def build(make: Callable[[int, str], Request]) -> List[Request]:
+        return [make(i, rng.choice(patients)) for i in range(count)]
+
+    def question(i: int) -> str:
+        # Numbered so the answer cache never turns the load into cache hits.
+        return f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})"
+
+    return {
+        "ask_patient": build(
+            lambda i, p: (
+                "POST",
+                "/ask_patient",
+                {"patient_name": p, "prompt": question(i)},
+            )
+        ),
+        "ask_meeting": build(
+            lambda i, p: (
+                "POST",
+                "/ask_meeting",
+                {
+                    "patient_name": p,
+                    "meeting_name": rng.choice(corpus[p])[: -len(".txt")],
+                    "prompt": question(i),
+                },
+            )
+        ),
+        "ask_global": build(
+            lambda i, p: ("POST", "/ask_global", {"prompt": question(i)})
+        ),
+        "summarize": build(
+            lambda i, p: (
+                "POST",
+                "/api/summarize-patient-file",
+                {"patient_name": p, "file_name": rng.choice(corpus[p])},
+            )
+        ),
+    }
+
+
+def wait_ready(port: int, server: subprocess.Popen, deadline_s: float) -> None:
+    started = time.perf_counter()
+    while time.perf_counter() - started < deadline_s:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            url = f"http://127.0.0.1:{port}/health/ready"
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError("server never became ready")
+
+
+def compare(report: dict, baseline: dict) -> None:
+    print(f"\nvs {baseline['git']['commit'][:12]}:")
+    for name, stats in report["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before:
+            continue
+        deltas = ", ".join(
+            f"{key} {100 * (stats[key] - before[key]) / before[key]:+.1f}%"
+            for key in ("throughput_rps", "p50_ms", "p99_ms", "ttft_p50_ms")
+            if before[key]
+        )
+        print(f"  {name}: {deltas}")
+    before, after = baseline["ingestion"], report["ingestion"]
+    print(
+        "  ingestion: docs/s "
+        f"{100 * (after['docs_per_second'] / before['docs_per_second'] - 1):+.1f}%"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--transcripts", type=int, default=5)
+    parser.add_argument("--words", type=int, default=1500)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--deadline", type=float, default=600)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="a previous JSON report to diff against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="serefine-load-")
+    staging = os.path.join(workdir, "staging")
+    corpus = make_corpus(
+        staging, args.patients, args.transcripts, args.words, args.seed
+    )
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])
+        ),
+        "LLM_PROVIDER": "mock",
+        "MOCK_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "MOCK_LLM_LATENCY_MS": str(args.latency_ms),
+        "MOCK_LLM_MAX_TOKENS": str(args.max_tokens),
+        "ANSWER_CACHE_ENABLED": "false",
+        "TRACING_ENABLED": "false",
+        "ANONYMIZED_TELEMETRY": "False",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port)],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(args.port, server, args.deadline)
+        ingestion = ingest(args.port, staging, corpus, args.concurrency)
+        print(
+            f"ingestion: {ingestion['documents']} docs in {ingestion['seconds']:.1f}s "
+            f"({ingestion['docs_per_second']:.1f} docs/s, "
+            f"{ingestion['failed_jobs']} failed jobs)"
+        )
+        endpoints = {}
+        for name, requests in scenarios(corpus, args.requests, args.seed).items():
+            endpoints[name] = stats = run_load(args.port, requests, args.concurrency)
+            print(
+                f"{name}: {stats['throughput_rps']:.1f} req/s, "
+                f"p50 {stats['p50_ms']:.0f}ms, p95 {stats['p95_ms']:.0f}ms, "
+                f"p99 {stats['p99_ms']:.0f}ms, ttft p50 {stats['ttft_p50_ms']:.0f}ms, "
+                f"{stats['errors']} errors"
+            )
+        rss = peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"peak RSS: {rss:.0f} MB" if rss is not None else "peak RSS: n/a")
+    report = {
+        "git": git_commit(),
+        "params": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "compare", "port", "deadline")
+        },
+        "ingestion": ingestion,
+        "endpoints": endpoints,
+        "peak_rss_mb": rss,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            compare(report, json.load(file))
+    return 0 if all(stats["errors"] == 0 for stats in endpoints.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Measure /ask_patient throughput as the number of uvicorn workers grows, all
+sharing one index-owner process.
+
+For each ``--workers`` count, starts ``python -m app.utils.index_server`` and
+``uvicorn main:app --workers N``, waits until every worker reports ready, then
+sends ``--requests`` questions with ``--concurrency`` in flight (distinct
+prompts, answer cache off) and prints requests/s and latency percentiles.
+Answers come from whichever LLM the environment configures.
+
+    python -m benchmarks.multi_worker --workers 1 2 4 --patient alice
+"""
+
+import argparse
+import json
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+
+def ask(base: str, patient: str, prompt: str) -> float:
+    started = time.perf_counter()
+    request = urllib.request.Request(
+        f"{base}/ask_patient",
+        data=json.dumps({"patient_name": patient, "prompt": prompt}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def wait_ready(base: str, workers: int, deadline_s: float) -> bool:
+    # Each request lands on some worker; enough consecutive successes make
+    # it very likely that all of them have finished warming up.
+    started, streak = time.perf_counter(), 0
+    while time.perf_counter() - started < deadline_s:
+        try:
+            with urllib.request.urlopen(f"{base}/health/ready", timeout=2):
+                streak += 1
+        except (urllib.error.URLError, ConnectionError):
+            streak = 0
+        if streak >= 5 * workers:
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def measure(args: argparse.Namespace, workers: int) -> Dict[str, float]:
+    address = f"127.0.0.1:{args.index_port}"
+    authkey = secrets.token_hex(16)
+    env = {**os.environ, "INDEX_SERVER_AUTHKEY": authkey}
+    env.pop("INDEX_SERVER_ADDRESS", None)
+    owner = subprocess.Popen(
+        [sys.executable, "-m", "app.utils.index_server", "--address", address],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app"]
+        + ["--port", str(args.port), "--workers", str(workers)],
+        env={**env, "INDEX_SERVER_ADDRESS": address, "ANSWER_CACHE_ENABLED": "false"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        if not wait_ready(base, workers, args.deadline):
+            raise RuntimeError(f"server with {workers} workers never became ready")
+        ask(base, args.patient, "warm-up question")
+        prompts = [f"{args.prompt} (#{i})" for i in range(args.requests)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies: List[float] = list(
+                pool.map(lambda prompt: ask(base, args.patient, prompt), prompts)
+            )
+        elapsed = time.perf_counter() - started
+    finally:
+        for process in (server, owner):
+            process.terminate()
+            process.wait()
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--patient", required=True)
+    parser.add_argument("--prompt", default="Summarize the latest session")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--index-port", type=int, default=8798)
+    parser.add_argument("--deadline", type=float, default=300)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        result = measure(args, workers)
+        baseline = baseline or result["rps"]
+        print(
+            f"{workers} workers: {result['rps']:.1f} req/s "
+            f"({result['rps'] / baseline:.2f}x), p50 {result['p50'] * 1000:.0f}ms, "
+            f"p95 {result['p95'] * 1000:.0f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
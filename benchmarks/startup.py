@@ -0,0 +1,78 @@
+"""
+Measure how long a fresh server process takes to accept connections and to
+report ready.
+
+Starts ``uvicorn main:app`` ``--runs`` times and polls /health/live and
+/health/ready, printing both times plus the warm-up step timings reported by
+the readiness endpoint.
+
+    python -m benchmarks.startup --runs 3
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Optional, Tuple
+
+
+def poll(url: str, timeout: float) -> Optional[Tuple[float, dict]]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return time.perf_counter(), json.loads(response.read())
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+
+def measure(port: int, deadline_s: float) -> dict:
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    live_s = ready_s = None
+    payload: dict = {}
+    try:
+        while time.perf_counter() - started < deadline_s:
+            if live_s is None:
+                result = poll(f"{base}/health/live", timeout=1)
+                if result is not None:
+                    live_s = result[0] - started
+            else:
+                result = poll(f"{base}/health/ready", timeout=1)
+                if result is not None:
+                    ready_s, payload = result[0] - started, result[1]
+                    break
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+    return {"live_s": live_s, "ready_s": ready_s, "steps": payload.get("steps", {})}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--deadline", type=float, default=300)
+    args = parser.parse_args()
+
+    ok = True
+    for run in range(args.runs):
+        result = measure(args.port, args.deadline)
+        ok &= result["ready_s"] is not None
+        steps = ", ".join(f"{k} {v:.2f}s" for k, v in result["steps"].items())
+        print(
+            f"run {run + 1}: live {result['live_s'] or float('nan'):.2f}s, "
+            f"ready {result['ready_s'] or float('nan'):.2f}s ({steps})"
+        )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,52 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routers.chat import chat_docs
+from app.api.routers.health import health_router
+from app.api.routers.jobs import jobs_router
+from app.api.routers.metrics import metrics_router
 from app.api.routers.patient_data import patient_data_router
-from app.arize_client import setup_arize_client
+from app.arize_client import shutdown_tracing
 from app.config import config
 from app.observability import init_observability
+from app.utils.catalog import patient_catalog
 from app.utils.error_handler import http_error_handler
+from app.utils.index_client import index_client
+from app.utils.index_server import run_index_server
+from app.utils.jobs import ingestion_queue
+from app.utils.warmup import warm_up
 
 # init_observability()
-setup_arize_client()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Warm-up runs in the background so the server accepts connections (and
+    # /health/ready can report progress) while the models load.
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up))
+    stop_watching = asyncio.Event()
+    watcher = None
+    # With several workers the index owner watches patient_data for them.
+    if config.CATALOG_WATCH_ENABLED and index_client is None:
+        watcher = asyncio.create_task(patient_catalog.watch(stop_watching))
+    yield
+    stop_watching.set()
+    if watcher is not None:
+        await watcher
+    await warmup
+    ingestion_queue.shutdown()
+    shutdown_tracing()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,13 +58,22 @@ app.add_middleware(
 
 app.add_exception_handler(HTTPException, http_error_handler)
 app.include_router(chat_docs)
+app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(patient_data_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        # workers=4,
-    )
+    if config.WEB_WORKERS > 1:
+        # Workers share one index owner instead of each opening Chroma.
+        with run_index_server():
+            uvicorn.run(
+                "main:app", host="0.0.0.0", port=8000, workers=config.WEB_WORKERS
+            )
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+        )
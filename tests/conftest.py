@@ -0,0 +1,8 @@
+import os
+
+# app.config reads the environment at import time, so these must be set before
+# any test imports the app. Tests never talk to AWS or Arize.
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("LLM_PROVIDER", "mock")
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.setdefault("CATALOG_WATCH_ENABLED", "false")
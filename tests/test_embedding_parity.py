@@ -0,0 +1,72 @@
+"""
+The ONNX embedding backend must stay interchangeable with the HuggingFace
+(torch) one: an export or pooling mistake shows up here as a drop in cosine
+similarity long before it shows up as worse retrieval. Skipped where torch,
+ONNX Runtime or the model itself is unavailable.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from app.config import config
+from benchmarks.embedding_backends import cosine, load_texts
+
+pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+huggingface = pytest.importorskip("llama_index.embeddings.huggingface")
+
+# pylint: disable=wrong-import-position
+from app.utils.embedding import OnnxEmbedding
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, "output (1).json")
+MIN_MEAN_COSINE = 0.99
+MIN_COSINE = 0.95
+
+
+@pytest.fixture(scope="module")
+def texts():
+    return load_texts(SAMPLE, 64)
+
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    try:
+        model = huggingface.HuggingFaceEmbedding(model_name=config.EMBEDDING_MODEL)
+    except OSError as e:
+        pytest.skip(f"{config.EMBEDDING_MODEL} is not available: {e}")
+    return embed(model, texts)
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("onnx"))
+
+
+def embed(model, texts):
+    return (
+        np.array(model.get_text_embedding_batch(texts)),
+        np.array([model.get_query_embedding(text) for text in texts[:16]]),
+    )
+
+
+@pytest.mark.parametrize("quantized", [False, True], ids=["fp32", "int8"])
+def test_onnx_matches_huggingface(texts, reference, model_dir, quantized):
+    model = OnnxEmbedding(
+        model_name=config.EMBEDDING_MODEL,
+        model_dir=model_dir,
+        quantized=quantized,
+        query_instruction=config.EMBEDDING_QUERY_INSTRUCTION,
+    )
+    text_embeddings, query_embeddings = embed(model, texts)
+    similarities = np.concatenate(
+        [
+            cosine(text_embeddings, reference[0]),
+            cosine(query_embeddings, reference[1]),
+        ]
+    )
+    assert similarities.mean() >= MIN_MEAN_COSINE
+    assert similarities.min() >= MIN_COSINE
@@ -0,0 +1,83 @@
+"""
+The index owner and its workers: every worker must see the one index the
+owner holds, including data ingested through another worker.
+"""
+
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.utils.index_client import IndexClient
+
+pytest.importorskip("llama_index.embeddings.huggingface")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def owner(tmp_path):
+    patient_dir = tmp_path / "patient_data" / "alice"
+    patient_dir.mkdir(parents=True)
+    (patient_dir / "intake.txt").write_text("Alice enjoys painting and music. " * 20)
+    address = str(tmp_path / "index.sock")
+    authkey = secrets.token_hex(16)
+    env = {
+        **os.environ,
+        "INDEX_SERVER_AUTHKEY": authkey,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])),
+        "ANONYMIZED_TELEMETRY": "False",
+    }
+    env.pop("INDEX_SERVER_ADDRESS", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.utils.index_server", "--address", address],
+        cwd=tmp_path,
+        env=env,
+    )
+    try:
+        yield tmp_path, address, authkey
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def wait_for_job(client: IndexClient, job_id: str, timeout: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get_job(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.2)
+    raise TimeoutError(f"Ingestion job {job_id} did not finish")
+
+
+def retrieve_texts(client: IndexClient, patient: str, query: str) -> list:
+    embedding = client.embed_query(query)
+    nodes = client.retrieve(("patient", patient), query, embedding, 10)
+    return [node.node.get_content() for node in nodes]
+
+
+def test_workers_share_the_owners_index(owner):
+    data_dir, address, authkey = owner
+    first = IndexClient(address, authkey, connect_timeout=120)
+    second = IndexClient(address, authkey, connect_timeout=120)
+
+    collection = first.open_collection("patient", "alice")
+    assert second.open_collection("patient", "alice") == collection
+    assert first.data_version(collection) == second.data_version(collection)
+    assert any(
+        "painting" in text for text in retrieve_texts(second, "alice", "hobbies")
+    )
+
+    # Ingest through one worker; the other sees it without opening anything.
+    version = second.data_version(collection)
+    (data_dir / "patient_data" / "alice" / "followup.txt").write_text(
+        "Alice has started learning the cello. " * 20
+    )
+    job = first.submit_ingestion("alice", {})
+    assert wait_for_job(second, job["job_id"])["status"] == "completed"
+    assert second.data_version(collection) != version
+    assert any("cello" in text for text in retrieve_texts(second, "alice", "music"))
@@ -0,0 +1,81 @@
+"""
+The LLM governor against ``SimulatedLLM``, which throttles like Bedrock once
+more than ``throttle_concurrency`` calls are in flight.
+"""
+
+import asyncio
+
+import pytest
+
+from app.utils.llm_governor import (
+    BATCH,
+    INTERACTIVE,
+    LLMDeadlineExceeded,
+    LLMGovernor,
+    is_throttling_error,
+)
+from app.utils.mock_llm import SimulatedLLM
+
+
+def simulated_llm(throttle_concurrency: int = 0) -> SimulatedLLM:
+    return SimulatedLLM(
+        latency_ms=50,
+        tokens_per_second=0,
+        max_tokens=4,
+        throttle_concurrency=throttle_concurrency,
+    )
+
+
+async def call(governor: LLMGovernor, llm: SimulatedLLM, priority: str) -> bool:
+    """One governed call; True if it went through, False if throttled."""
+    try:
+        async with governor.aslot(priority):
+            await llm.acomplete("How did the session go?")
+        return True
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        if not is_throttling_error(e):
+            raise
+        return False
+
+
+def test_limit_drops_on_throttle_and_recovers():
+    governor = LLMGovernor(max_concurrency=8, increase=1.0, decrease=0.5)
+    llm = simulated_llm(throttle_concurrency=2)
+
+    async def burst():
+        return await asyncio.gather(
+            *(call(governor, llm, INTERACTIVE) for _ in range(8))
+        )
+
+    results = asyncio.run(burst())
+    assert not all(results)
+    # Halved once for the burst, however many calls in it were throttled,
+    # then nudged up by the calls that went through.
+    assert 4.0 <= governor.limit < 5.0
+    assert governor.stats()["throttled"] == results.count(False)
+
+    llm.throttle_concurrency = 0
+
+    async def recover():
+        for _ in range(40):
+            assert await call(governor, llm, INTERACTIVE)
+
+    asyncio.run(recover())
+    assert governor.limit == pytest.approx(8.0)
+
+
+def test_batch_call_past_its_deadline_is_dropped():
+    governor = LLMGovernor(max_concurrency=1, deadlines={BATCH: 0.1})
+    held = governor.acquire(INTERACTIVE)
+
+    async def wait_for_batch_slot():
+        await governor.aacquire(BATCH)
+
+    with pytest.raises(LLMDeadlineExceeded):
+        asyncio.run(wait_for_batch_slot())
+    assert governor.stats()["dropped"] == 1
+    assert governor.stats()["queued"][BATCH] == 0
+
+    governor.release(held)
+    # Interactive calls have no deadline and still get the freed slot.
+    assert governor.acquire(INTERACTIVE).priority == INTERACTIVE